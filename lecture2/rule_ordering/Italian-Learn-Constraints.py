@@ -0,0 +1,61 @@
+# Script to learn a rule ordering that converts Italian orthography to a more `phonetic' representation. It takes a set of known rules (in random order), and tries to find a compatible ordering.
+# This version does not search through orders at all (at least, not at first): for each word, it works out which rules must precede which in order to derive the right answer, and then puts the rules in an order that respects all of these requirements
+import sys
+import time
+# We'll use "shuffle" to randomly change the rule order
+import random
+
+# Some useful functions defined for this purpose
+from transliterate import RuleCascade
+from rule_files import read_rules, read_words
+from rule_order_solver import solve_rule_order
+
+# An option to mark geminates with a colon
+geminates_long = True
+
+# This is supervised learning, in which the model is given both the input and the output. These are in separate files: a file with the input to convert, and a file with the answer
+input_filename = "italian-words.txt"
+check_filename = "italian-words.phonetic.txt"
+# We are also given the rules in advance (but we should not assume that the order is correct)
+rules_filename = "ItalianRules.txt"
+output_rules_filename = "ItalianRules.Ordered.txt"
+
+# Read in the rules, the inputs, and the correct answers
+rules = read_rules(rules_filename)
+inputs = read_words(input_filename)
+answers = read_words(check_filename)
+
+# A rule order is "consistent" if it generates the same output for all of the inputs as the given answer.
+# First, a sanity check, to make sure no user error. The number of inputs and answers should match. It not, squawk and give up.
+if len(inputs) != len(answers):
+	print ("Warning! different numbers of inputs (%s) and outputs (%s). Cannot continue." % (len(inputs), len(answers)))
+	sys.exit()
+
+# Compile the rules once
+cascade = RuleCascade(rules, geminates_long)
+
+# The start state is random (this only matters for rules whose relative order doesn't matter)
+order = list(range(len(rules)))
+random.shuffle(order)
+cascade.reorder(order)
+
+start_time = time.perf_counter()
+order, number_correct, conflicts = solve_rule_order(cascade, inputs, answers)
+elapsed_time = time.perf_counter() - start_time
+
+# If some rules made conflicting demands, say which ones
+for conflict in conflicts:
+	print("Conflicting requirements (each rule must precede the next, and the last must precede the first):")
+	for r in conflict:
+		print("\t%s" % "\t".join(rules[r]))
+
+if number_correct < len(inputs):
+	print ("No consistent order found (best order gets %s of %s correct, in %.3f seconds)." % (number_correct, len(inputs), elapsed_time))
+else:
+	print ("Consistent order found in %.3f seconds." % (elapsed_time))
+
+# Either way, save the order we ended up with
+output_file = open(output_rules_filename, 'w')
+for rule in cascade.ordered_rules():
+	output_file.write( "\t".join(rule) + "\n");
+output_file.close()
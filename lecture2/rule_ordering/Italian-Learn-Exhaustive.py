@@ -8,12 +8,21 @@ from random import shuffle
 import itertools
 
 # Two useful functions defined for this purpose
-from transliterate import transliterate
-from count_correct import count_correct
+from transliterate import RuleCascade
+from count_correct import count_correct, all_correct, FailureOrder
+# For searching in parallel
+from permutation_search import parallel_exhaustive_search, load_checkpoint
 
 # An option to mark geminates with a colon
 geminates_long = True
 
+# An option to search in parallel: the orders are split into ranges, and each range is searched by one of several processes
+parallel = False
+# How many processes to use (None means one per CPU)
+processes = None
+# When searching in parallel, the ranges that have been searched are saved to this file, so that an interrupted search can pick up where it left off (None to turn this off)
+checkpoint_filename = "ItalianRules.Exhaustive.checkpoint"
+
 # This is supervised learning, in which the model is given both the input and the output. These are in separate files: a file with the input to convert, and a file with the answer
 input_filename = "italian-words.txt"
 check_filename = "italian-words.phonetic.txt"
@@ -65,41 +74,67 @@ output_file = open(output_rules_filename, 'w')
 if len(inputs) != len(answers):
 	print ("Warning! different numbers of inputs (%s) and outputs (%s). Cannot continue." % (len(inputs), len(answers)))
 	sys.exit()
+
+# Compile the rules once. From here on, the search changes the order of the rule indices (0 to number of rules - 1), rather than the rules themselves
+cascade = RuleCascade(rules, geminates_long)
 	
 
 # The start state is random
-shuffle(rules)
-
-# Start by checking how many are correct at the start state
-number_correct = count_correct(inputs, answers, rules, geminates_long)
-
-# Keep track of how many steps it takes to find a consistent order
-number_of_iterations = 0;
-
-# Now iterate: change the grammar, see if things improve.
-# Changing the grammar here consists of stepping through all possible orders. We can get those up from, with "permutate"
-searchorder = itertools.permutations(rules)
-
-current_order = 0
-
-while number_correct < len(inputs):
-	# Try the next order of rules
-	current_order += 1
-	rules = list(next(searchorder))
-
-	# Now try applying the set of rules.
-	# Go through the inputs and search and replace, applying the rules in order
-	number_correct = count_correct(inputs, answers, rules, geminates_long)
-
-	number_of_iterations += 1
-	# Every so often, print how we're doing
-	if (number_of_iterations % 100 == 0):
-		print( "\tIteration %s: %s correct" % (number_of_iterations, number_correct))
+order = list(range(len(rules)))
+shuffle(order)
+cascade.reorder(order)
+
+if parallel:
+	# The ranges of orders are numbered relative to the starting order of the rules. If we are resuming an earlier search of these rules, start from the order it used
+	checkpoint = load_checkpoint(checkpoint_filename)
+	if checkpoint is not None and sorted(checkpoint["rules"]) == sorted(rules):
+		start_rules = checkpoint["rules"]
+	else:
+		start_rules = cascade.ordered_rules()
+
+	consistent_order, number_of_iterations = parallel_exhaustive_search(start_rules, inputs, answers, geminates_long, processes=processes, checkpoint_filename=checkpoint_filename)
+	if consistent_order is None:
+		print ("No consistent order exists (searched %s orders)." % (number_of_iterations))
+		sys.exit()
+	cascade = RuleCascade(start_rules, geminates_long)
+	cascade.reorder(consistent_order)
+
+else:
+	# Start by checking how many are correct at the start state
+	number_correct = count_correct(inputs, answers, cascade)
+
+	# Keep track of how many steps it takes to find a consistent order
+	number_of_iterations = 0;
+
+	# Now iterate: change the grammar, see if things improve.
+	# Changing the grammar here consists of stepping through all possible orders. We can get those up from, with "permutate"
+	searchorder = itertools.permutations(order)
+
+	current_order = 0
+
+	# We only need to know whether each order gets everything right, so each order is abandoned at the first wrong word. The words that have been failing most are checked first
+	failure_order = FailureOrder(len(inputs))
+	found = (number_correct == len(inputs))
+
+	while not found:
+		# Try the next order of rules
+		current_order += 1
+		cascade.reorder(next(searchorder))
+
+		# Now try applying the set of rules.
+		# Go through the inputs and search and replace, applying the rules in order
+		found = all_correct(inputs, answers, cascade, failure_order=failure_order)
+
+		number_of_iterations += 1
+		# Every so often, print how we're doing (which means counting all of the correct words for this one)
+		if (number_of_iterations % 100 == 0):
+			number_correct = count_correct(inputs, answers, cascade)
+			print( "\tIteration %s: %s correct" % (number_of_iterations, number_correct))
 
 # Now we've got everything right! Just print out the list of rules
 print ("Consistent order found in %s iterations." % (number_of_iterations))
 
-for rule in rules:
+for rule in cascade.ordered_rules():
 	output_file.write( "\t".join(rule) + "\n");
 
 
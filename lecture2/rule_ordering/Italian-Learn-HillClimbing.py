@@ -6,8 +6,8 @@ import sys
 import random
 
 # Two useful functions defined for this purpose
-from transliterate import transliterate
-from count_correct import count_correct
+from transliterate import RuleCascade
+from count_correct import IncrementalEvaluator
 
 # How many times to try
 trials = 10
@@ -72,15 +72,22 @@ if len(inputs) != len(answers):
 	print ("Warning! different numbers of inputs (%s) and outputs (%s). Cannot continue." % (len(inputs), len(answers)))
 	sys.exit()
 
+# Compile the rules once. From here on, the search changes the order of the rule indices (0 to number of rules - 1), rather than the rules themselves
+cascade = RuleCascade(rules, geminates_long)
+
 # A list to keep the number of iterations each trial takes
 iterations_count = []
 # Try learning, t times
 for t in range(0,trials):
 	# The start state is random
-	random.shuffle(rules)
+	order = list(range(len(rules)))
+	random.shuffle(order)
+	cascade.reorder(order)
+	# Keep track of each word's intermediate forms, so that each proposal only needs to recompute the derivation from the first swapped rule onward
+	evaluator = IncrementalEvaluator(cascade, inputs, answers)
 
 	# Start by checking how many are correct at the start state
-	number_correct = count_correct(inputs, answers, rules, geminates_long)
+	number_correct = evaluator.number_correct
 
 	# Keep track of how many steps it takes to find a consistent order
 	number_of_iterations = 0;
@@ -90,33 +97,35 @@ for t in range(0,trials):
 		# Try changing the rules somehow.  
 		# In this script, we swap the order of a pair of adjacent rules, and see if it improves. 
 
-		# In order to do this, we'll make a new "proposal" copy of the rules
-		new_rules = rules;
 		# Pick a random rule 
-		i = random.randint(0,len(new_rules)-1)
+		i = random.randint(0,len(order)-1)
 		# Now pick another random rule, with the stipulation that it be a distinct rule (don't swap a rule with itself)
 		j = i
 		while (j == i):
-			j = random.randint(0,len(new_rules)-1)
-		# Now swap them
-		new_rules[i], new_rules[j] = new_rules[j], new_rules[i]
-
-		# Now try applying the set of rules.
-		# Go through the inputs and search and replace, applying the rules in order
-		new_number_correct = count_correct(inputs, answers, new_rules, geminates_long)
-
-		# Keep the new rule order if it's better than the old order
-		if new_number_correct > number_correct and random.random() >= 1-accept_better:
-			rules = new_rules
-			number_correct = new_number_correct
-		# If it's equal, keep it at a predetermined probability
-		elif new_number_correct == number_correct and random.random() >= 1-accept_equal:
-			rules = new_rules
-			number_correct = new_number_correct
-		# Otherwise, with some very small probability accept it anyway
-		elif random.random() > 1-accept_worse:
-			rules = new_rules
-			number_correct = new_number_correct
+			j = random.randint(0,len(order)-1)
+
+		# Now try applying the set of rules with the two swapped. This is just a "proposal": the swap isn't kept unless we accept it
+		# Decide in advance which kinds of change we would keep this time around. Then the proposal only has to be worked out far enough to tell whether it's good enough: it gives up as soon as too many words are wrong
+		keep_better = random.random() >= 1-accept_better
+		keep_equal = random.random() >= 1-accept_equal
+		# With some very small probability, keep it even if it's worse
+		keep_worse = random.random() > 1-accept_worse
+		if keep_worse:
+			evaluator.propose_swap(i, j)
+			number_correct = evaluator.accept()
+		else:
+			if keep_equal:
+				stop_below = number_correct
+			elif keep_better:
+				stop_below = number_correct + 1
+			else:
+				# We wouldn't keep it whatever happened, so there's no need to try it
+				stop_below = None
+			if stop_below is not None:
+				new_number_correct = evaluator.propose_swap(i, j, stop_below)
+				# Keep the new rule order if it's better than the old order, or if it's equal and we keep equal ones
+				if (new_number_correct > number_correct and keep_better) or (new_number_correct == number_correct and keep_equal):
+					number_correct = evaluator.accept()
 	
 		number_of_iterations += 1
 		# Every so often, print how we're doing
@@ -126,7 +135,7 @@ for t in range(0,trials):
 	# Now we've got everything right! Just print out the list of rules
 	print ("Consistent order found in %s iterations." % (number_of_iterations))
 	iterations_count.append(str(number_of_iterations))
-	for rule in rules:
+	for rule in cascade.ordered_rules():
 		output_file.write( "\t".join(rule) + "\n");
 
 
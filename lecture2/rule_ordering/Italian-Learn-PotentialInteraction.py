@@ -6,8 +6,10 @@ import sys
 import random
 
 # Two useful functions defined for this purpose
-from transliterate import transliterate
-from count_correct import count_correct
+from transliterate import RuleCascade
+from count_correct import IncrementalEvaluator
+# Which pairs of rules could interact
+from rule_interactions import interaction_graph
 
 # An option to mark geminates with a colon
 geminates_long = True
@@ -63,13 +65,26 @@ output_file = open(output_rules_filename, 'w')
 if len(inputs) != len(answers):
 	print ("Warning! different numbers of inputs (%s) and outputs (%s). Cannot continue." % (len(inputs), len(answers)))
 	sys.exit()
+
+# Compile the rules once. From here on, the search changes the order of the rule indices (0 to number of rules - 1), rather than the rules themselves
+cascade = RuleCascade(rules, geminates_long)
+
+# Work out once, in advance, which pairs of rules could interact: pairs where one rule could create or destroy material that the other looks at, and that could both apply to the same word. Only these pairs are worth swapping
+interacting_pairs = interaction_graph(cascade, inputs)
+if len(interacting_pairs) == 0:
+	print ("None of the rules can interact, so their order can't matter.")
+	sys.exit()
 	
 
 # The start state is random
-random.shuffle(rules)
+order = list(range(len(rules)))
+random.shuffle(order)
+cascade.reorder(order)
+# Keep track of each word's intermediate forms, so that each swap only needs to recompute the derivation from the first swapped rule onward
+evaluator = IncrementalEvaluator(cascade, inputs, answers)
 
 # Start by checking how many are correct at the start state
-number_correct = count_correct(inputs, answers, rules, geminates_long)
+number_correct = evaluator.number_correct
 
 # Keep track of how many steps it takes to find a consistent order
 number_of_iterations = 0;
@@ -77,31 +92,14 @@ number_of_iterations = 0;
 # Now iterate: change the grammar, see if things improve.
 while number_correct < len(inputs):
 	# Try changing the rules somehow.  
-	# In this script, we swap the order of a pair of adjacent rules.  Keep searching until we find two we can swap
-	successful_swap = False
-	
-	while successful_swap == False:
-		# Pick a random rule 
-		i = random.randint(0,len(rules)-1)
-		# Now pick another random rule, with the stipulation that it be a distinct rule (don't swap a rule with itself)
-		j = i
-		while (j == i):
-			j = random.randint(0,len(rules)-1)
-		# Now check whether the rules could interact. 
-		# A rough heuristic: Check if rule 2's struc desc contains any of the segments in rule 1's struc desc
-		# The segments in rule 2's struc desc:
-		rule1_strucdesc = rules[i][0]
-		rule1_strucdesc = "[" + re.sub(r'[^\w]', '',rule1_strucdesc) + "]"
-		rule2_strucdesc = rules[j][0]
-		# The check
-		if re.compile(rule1_strucdesc).match(rule2_strucdesc):
-#			print( "Potential interaction:\t%s\t%s" % (rule1_strucdesc, rule2_strucdesc))
-			rules[i], rules[j] = rules[j], rules[i]
-			successful_swap = True
-
-	# Now try applying the set of rules.
-	# Go through the inputs and search and replace, applying the rules in order
-	number_correct = count_correct(inputs, answers, rules, geminates_long)
+	# In this script, we swap the order of a pair of rules that could interact.
+	# Pick a random interacting pair, and find where the two rules are in the current order
+	rule1, rule2 = random.choice(interacting_pairs)
+	i = evaluator.order.index(rule1)
+	j = evaluator.order.index(rule2)
+
+	# Now swap them, and try applying the new set of rules.
+	number_correct = evaluator.swap(i, j)
 
 	number_of_iterations += 1
 	# Every so often, print how we're doing
@@ -111,7 +109,7 @@ while number_correct < len(inputs):
 # Now we've got everything right! Just print out the list of rules
 print ("Consistent order found in %s iterations." % (number_of_iterations))
 
-for rule in rules:
+for rule in cascade.ordered_rules():
 	output_file.write( "\t".join(rule) + "\n");
 
 
@@ -6,8 +6,10 @@ import sys
 import random
 
 # Two useful functions defined for this purpose
-from transliterate import transliterate
-from count_correct import count_correct
+from transliterate import RuleCascade
+from count_correct import IncrementalEvaluator
+# Which pairs of rules could interact
+from rule_interactions import interaction_graph
 
 # Some options for hill-climbing
 accept_better = 1
@@ -68,13 +70,26 @@ output_file = open(output_rules_filename, 'w')
 if len(inputs) != len(answers):
 	print ("Warning! different numbers of inputs (%s) and outputs (%s). Cannot continue." % (len(inputs), len(answers)))
 	sys.exit()
+
+# Compile the rules once. From here on, the search changes the order of the rule indices (0 to number of rules - 1), rather than the rules themselves
+cascade = RuleCascade(rules, geminates_long)
+
+# Work out once, in advance, which pairs of rules could interact: pairs where one rule could create or destroy material that the other looks at, and that could both apply to the same word. Only these pairs are worth swapping
+interacting_pairs = interaction_graph(cascade, inputs)
+if len(interacting_pairs) == 0:
+	print ("None of the rules can interact, so their order can't matter.")
+	sys.exit()
 	
 
 # The start state is random
-random.shuffle(rules)
+order = list(range(len(rules)))
+random.shuffle(order)
+cascade.reorder(order)
+# Keep track of each word's intermediate forms, so that each swap only needs to recompute the derivation from the first swapped rule onward
+evaluator = IncrementalEvaluator(cascade, inputs, answers)
 
 # Start by checking how many are correct at the start state
-number_correct = count_correct(inputs, answers, rules, geminates_long)
+number_correct = evaluator.number_correct
 
 # Keep track of how many steps it takes to find a consistent order
 number_of_iterations = 0;
@@ -82,46 +97,34 @@ number_of_iterations = 0;
 # Now iterate: change the grammar, see if things improve.
 while number_correct < len(inputs):
 	# Try changing the rules somehow.  
-	# In this script, we swap the order of a pair of adjacent rules.  Keep searching until we find two we can swap.  Since it's hill climbing, the swap is a proposal, which we'll do on a copy
-	new_rules = rules
-	
-	successful_swap = False
-	
-	while successful_swap == False:
-		# Pick a random rule 
-		i = random.randint(0,len(new_rules)-1)
-		# Now pick another random rule, with the stipulation that it be a distinct rule (don't swap a rule with itself)
-		j = i
-		while (j == i):
-			j = random.randint(0,len(new_rules)-1)
-		# Now check whether the rules could interact. 
-		# A rough heuristic: Check if rule 2's struc desc contains any of the segments in rule 1's struc desc
-		# The segments in rule 2's struc desc:
-		rule1_strucdesc = new_rules[i][0]
-		rule1_strucdesc = "[" + re.sub(r'[^\w]', '',rule1_strucdesc) + "]"
-		rule2_strucdesc = new_rules[j][0]
-		# The check
-		if re.compile(rule1_strucdesc).match(rule2_strucdesc):
-#			print( "Potential interaction:\t%s\t%s" % (rule1_strucdesc, rule2_strucdesc))
-			new_rules[i], new_rules[j] = new_rules[j], new_rules[i]
-			successful_swap = True
-
-	# Now try applying the set of rules.
-	# Go through the inputs and search and replace, applying the rules in order
-	new_number_correct = count_correct(inputs, answers, new_rules, geminates_long)
-	
-	# Keep the new rule order if it's better than the old order
-	if new_number_correct > number_correct and random.random() >= 1-accept_better:
-		rules = new_rules
-		number_correct = new_number_correct
-	# If it's equal, keep it at a predetermined probability
-	elif new_number_correct == number_correct and random.random() >= 1-accept_equal:
-		rules = new_rules
-		number_correct = new_number_correct
-	# Otherwise, with some very small probability accept it anyway
-	elif random.random() > 1-accept_worse:
-		rules = new_rules
-		number_correct = new_number_correct
+	# In this script, we swap the order of a pair of rules that could interact.
+	# Pick a random interacting pair, and find where the two rules are in the current order
+	rule1, rule2 = random.choice(interacting_pairs)
+	i = evaluator.order.index(rule1)
+	j = evaluator.order.index(rule2)
+
+	# Now try applying the set of rules with the two swapped. Since it's hill climbing, the swap is a proposal, which isn't kept unless we accept it
+	# Decide in advance which kinds of change we would keep this time around. Then the proposal only has to be worked out far enough to tell whether it's good enough: it gives up as soon as too many words are wrong
+	keep_better = random.random() >= 1-accept_better
+	keep_equal = random.random() >= 1-accept_equal
+	# With some very small probability, keep it even if it's worse
+	keep_worse = random.random() > 1-accept_worse
+	if keep_worse:
+		evaluator.propose_swap(i, j)
+		number_correct = evaluator.accept()
+	else:
+		if keep_equal:
+			stop_below = number_correct
+		elif keep_better:
+			stop_below = number_correct + 1
+		else:
+			# We wouldn't keep it whatever happened, so there's no need to try it
+			stop_below = None
+		if stop_below is not None:
+			new_number_correct = evaluator.propose_swap(i, j, stop_below)
+			# Keep the new rule order if it's better than the old order, or if it's equal and we keep equal ones
+			if (new_number_correct > number_correct and keep_better) or (new_number_correct == number_correct and keep_equal):
+				number_correct = evaluator.accept()
 
 
 	number_of_iterations += 1
@@ -132,7 +135,7 @@ while number_correct < len(inputs):
 # Now we've got everything right! Just print out the list of rules
 print ("Consistent order found in %s iterations." % (number_of_iterations))
 
-for rule in rules:
+for rule in cascade.ordered_rules():
 	output_file.write( "\t".join(rule) + "\n");
 
 
@@ -6,11 +6,14 @@ import sys
 from random import shuffle
 
 # Two useful functions defined for this purpose
-from transliterate import transliterate
+from transliterate import RuleCascade
 from count_correct import count_correct
+from order_batches import OrderScorer
 
 # An option to mark geminates with a colon
 geminates_long = True
+# How many random orders to score together at a time
+batch_size = 1000
 
 # This is supervised learning, in which the model is given both the input and the output. These are in separate files: a file with the input to convert, and a file with the answer
 input_filename = "italian-words.txt"
@@ -63,36 +66,52 @@ output_file = open(output_rules_filename, 'w')
 if len(inputs) != len(answers):
 	print ("Warning! different numbers of inputs (%s) and outputs (%s). Cannot continue." % (len(inputs), len(answers)))
 	sys.exit()
+
+# Compile the rules once. From here on, the search changes the order of the rule indices (0 to number of rules - 1), rather than the rules themselves
+cascade = RuleCascade(rules, geminates_long)
 	
 
 # The start state is random
-shuffle(rules)
+order = list(range(len(rules)))
+shuffle(order)
+cascade.reorder(order)
 
 # Start by checking how many are correct at the start state
-number_correct = count_correct(inputs, answers, rules, geminates_long)
+number_correct = count_correct(inputs, answers, cascade)
 
 # Keep track of how many steps it takes to find a consistent order
 number_of_iterations = 0;
 
+# The random orders are independent of each other, so rather than trying them one at a time, we make a batch of them and score them all together. The scorer remembers what each word turns into along the way, so that the parts that the orders have in common are only worked out once
+scorer = OrderScorer(cascade, inputs, answers)
+
 # Now iterate: change the grammar, see if things improve.
 while number_correct < len(inputs):
 	# Try changing the rules somehow.  
 	# In this script, we just randomly reorder them.
-	shuffle(rules)
-
-	# Now try applying the set of rules.
-	# Go through the inputs and search and replace, applying the rules in order
-	number_correct = count_correct(inputs, answers, rules, geminates_long)
-
-	number_of_iterations += 1
-	# Every so often, print how we're doing
-	if (number_of_iterations % 100 == 0):
-		print( "\tIteration %s: %s correct" % (number_of_iterations, number_correct))
+	batch = []
+	for n in range(batch_size):
+		shuffle(order)
+		batch.append(order.copy())
+
+	# Now try applying each set of rules.
+	# Go through the inputs and search and replace, applying the rules in order. We only need to know which orders get everything right, so each order is given up on at the first wrong word
+	scores = scorer.score_orders(batch, stop_below=len(inputs))
+
+	# Go through the batch until we get to one that gets everything right
+	for new_order, number_correct in zip(batch, scores):
+		number_of_iterations += 1
+		# Every so often, print how we're doing (which means counting all of the correct words for this one)
+		if (number_of_iterations % 100 == 0):
+			print( "\tIteration %s: %s correct" % (number_of_iterations, scorer.score(new_order)))
+		if number_correct == len(inputs):
+			cascade.reorder(new_order)
+			break
 
 # Now we've got everything right! Just print out the list of rules
 print ("Consistent order found in %s iterations." % (number_of_iterations))
 
-for rule in rules:
+for rule in cascade.ordered_rules():
 	output_file.write( "\t".join(rule) + "\n");
 
 
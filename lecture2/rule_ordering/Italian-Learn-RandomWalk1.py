@@ -6,8 +6,8 @@ import sys
 import random
 
 # Two useful functions defined for this purpose
-from transliterate import transliterate
-from count_correct import count_correct
+from transliterate import RuleCascade
+from count_correct import IncrementalEvaluator
 
 # An option to mark geminates with a colon
 geminates_long = True
@@ -63,13 +63,20 @@ output_file = open(output_rules_filename, 'w')
 if len(inputs) != len(answers):
 	print ("Warning! different numbers of inputs (%s) and outputs (%s). Cannot continue." % (len(inputs), len(answers)))
 	sys.exit()
+
+# Compile the rules once. From here on, the search changes the order of the rule indices (0 to number of rules - 1), rather than the rules themselves
+cascade = RuleCascade(rules, geminates_long)
 	
 
 # The start state is random
-random.shuffle(rules)
+order = list(range(len(rules)))
+random.shuffle(order)
+cascade.reorder(order)
+# Keep track of each word's intermediate forms, so that each swap only needs to recompute the derivation from the first swapped rule onward
+evaluator = IncrementalEvaluator(cascade, inputs, answers)
 
 # Start by checking how many are correct at the start state
-number_correct = count_correct(inputs, answers, rules, geminates_long)
+number_correct = evaluator.number_correct
 
 # Keep track of how many steps it takes to find a consistent order
 number_of_iterations = 0;
@@ -79,13 +86,10 @@ while number_correct < len(inputs):
 	# Try changing the rules somehow.  
 	# In this script, we swap the order of a pair of adjacent rules. 
 	# Pick a random rule to swap with the one that comes after it
-	i = random.randint(0,len(rules)-2)
-	# Now swap them
-	rules[i], rules[i+1] = rules[i+1], rules[i]
+	i = random.randint(0,len(order)-2)
 
-	# Now try applying the set of rules.
-	# Go through the inputs and search and replace, applying the rules in order
-	number_correct = count_correct(inputs, answers, rules, geminates_long)
+	# Now swap them, and try applying the new set of rules.
+	number_correct = evaluator.swap(i, i+1)
 
 	number_of_iterations += 1
 	# Every so often, print how we're doing
@@ -95,7 +99,7 @@ while number_correct < len(inputs):
 # Now we've got everything right! Just print out the list of rules
 print ("Consistent order found in %s iterations." % (number_of_iterations))
 
-for rule in rules:
+for rule in cascade.ordered_rules():
 	output_file.write( "\t".join(rule) + "\n");
 
 
@@ -0,0 +1,76 @@
+# Script to learn a rule ordering that converts Italian orthography to a more `phonetic' representation. It takes a set of known rules (in random order), and tries to find a compatible ordering.
+# This version runs several different search strategies (random samples, random walks, hill climbing, simulated annealing, tabu search, hill climbing with random restarts) a number of times each, and writes out statistics about each trial, so that the strategies can be compared
+import sys
+
+# Some useful functions defined for this purpose
+from rule_files import read_rules, read_words
+from search_strategies import run_trials, write_statistics
+
+# How many times to try each strategy
+trials = 10
+# The strategies to try, each with its options (see search_strategies.py for what the options mean)
+strategy_list = [
+	("random_samples", {}),
+	("random_walk", {}),
+	("hill_climbing", {"accept_better": 1, "accept_equal": 1, "accept_worse": 0}),
+	("annealing", {"start_temperature": 2.0, "cooling": 0.999}),
+	("tabu", {"tabu_size": 10, "candidates": 8}),
+	("random_restarts", {"patience": 500}),
+]
+# Limits on each trial (None for no limit)
+max_iterations = None
+max_seconds = 60
+# An option to only swap rules that could interact with each other (as in the PotentialInteraction scripts)
+interacting_only = False
+# How many processes to run trials in (None means one per CPU)
+processes = None
+# The random seed for the first trial of each strategy (the others use the following seeds)
+seed = 0
+
+# An option to mark geminates with a colon
+geminates_long = True
+
+# This is supervised learning, in which the model is given both the input and the output. These are in separate files: a file with the input to convert, and a file with the answer
+input_filename = "italian-words.txt"
+check_filename = "italian-words.phonetic.txt"
+# We are also given the rules in advance (but we should not assume that the order is correct)
+rules_filename = "ItalianRules.txt"
+output_rules_filename = "ItalianRules.Ordered.txt"
+# Where to write the statistics for each trial
+statistics_filename = "ItalianRules.SearchStatistics.txt"
+
+# Read in the rules, the inputs, and the correct answers
+rules = read_rules(rules_filename)
+inputs = read_words(input_filename)
+answers = read_words(check_filename)
+
+# A rule order is "consistent" if it generates the same output for all of the inputs as the given answer.
+# First, a sanity check, to make sure no user error. The number of inputs and answers should match. It not, squawk and give up.
+if len(inputs) != len(answers):
+	print ("Warning! different numbers of inputs (%s) and outputs (%s). Cannot continue." % (len(inputs), len(answers)))
+	sys.exit()
+
+results = run_trials(strategy_list, rules, geminates_long, inputs, answers, trials, seed, max_iterations, max_seconds, interacting_only, processes)
+write_statistics(results, statistics_filename)
+
+# Print a summary for each strategy: how many trials found a consistent order, and how long they took on average
+print("Strategy\tSolved\tMean iterations\tMean seconds\tMean evaluations/sec")
+for strategy, options in strategy_list:
+	strategy_results = [statistics for statistics in results if statistics["strategy"] == strategy]
+	solved = [statistics for statistics in strategy_results if statistics["solved"]]
+	mean_iterations = sum(statistics["iterations"] for statistics in strategy_results) / len(strategy_results)
+	mean_seconds = sum(statistics["seconds"] for statistics in strategy_results) / len(strategy_results)
+	mean_rate = sum(statistics["evaluations_per_second"] for statistics in strategy_results) / len(strategy_results)
+	print("%s\t%s/%s\t%.1f\t%.3f\t%.1f" % (strategy, len(solved), len(strategy_results), mean_iterations, mean_seconds, mean_rate))
+print("Statistics for each trial written to %s" % statistics_filename)
+
+# Save the consistent order found by the fastest successful trial
+solved = [statistics for statistics in results if statistics["solved"]]
+if len(solved) == 0:
+	print("No trial found a consistent order.")
+	sys.exit()
+fastest = min(solved, key=lambda statistics: statistics["seconds"])
+output_file = open(output_rules_filename, 'w')
+for r in fastest["order"]:
+	output_file.write( "\t".join(rules[r]) + "\n");
+output_file.close()
@@ -3,7 +3,7 @@
 import re
 import sys
 # Two useful functions defined for this purpose
-from transliterate import transliterate
+from transliterate import RuleCascade
 from count_correct import count_correct
 
 # For shuffling and random orders
@@ -64,12 +64,17 @@ output_file = open(output_rules_filename, 'w')
 if len(inputs) != len(answers):
 	print ("Warning! different numbers of inputs (%s) and outputs (%s). Cannot continue." % (len(inputs), len(answers)))
 	sys.exit()
+
+# Compile the rules once. From here on, the search changes the order of the rule indices (0 to number of rules - 1), rather than the rules themselves
+cascade = RuleCascade(rules, geminates_long)
 	
 # The start state is random
-random.shuffle(rules)
+order = list(range(len(rules)))
+random.shuffle(order)
+cascade.reorder(order)
 
 # Start by checking how many are correct at the start state
-number_correct = count_correct(inputs, answers, rules, geminates_long)
+number_correct = count_correct(inputs, answers, cascade)
 
 # Keep track of how many steps it takes to find a consistent order
 number_of_iterations = 0;
@@ -81,7 +86,7 @@ while number_correct < len(inputs):
 	
 	# Now try applying the set of rules.
 	# Go through the inputs and search and replace, applying the rules in order
-	number_correct = count_correct(inputs, answers, rules, geminates_long)
+	number_correct = count_correct(inputs, answers, cascade)
 
 	number_of_iterations += 1
 	# Every so often, print how we're doing
@@ -91,7 +96,7 @@ while number_correct < len(inputs):
 # Now we've got everything right! Just print out the list of rules
 print ("Consistent order found in %s iterations." % (number_of_iterations))
 
-for rule in rules:
+for rule in cascade.ordered_rules():
 	output_file.write( "\t".join(rule) + "\n");
 
 
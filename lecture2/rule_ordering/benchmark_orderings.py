@@ -0,0 +1,115 @@
+# A benchmark for the rule ordering scripts: how many candidate orderings can be evaluated per second?
+# It evaluates the same random orders of the Italian rules on the Italian words in different ways, and reports the orderings per second for each
+import sys
+import time
+import random
+
+from transliterate import RuleCascade
+from count_correct import count_correct, all_correct, FailureOrder, IncrementalEvaluator
+from order_batches import OrderScorer
+from rule_files import read_rules, read_words
+
+# How many random orders to evaluate, and with what random seed
+if len(sys.argv) > 1:
+	number_of_orders = int(sys.argv[1])
+else:
+	number_of_orders = 2000
+random.seed(981)
+
+geminates_long = True
+rules = read_rules("ItalianRules.txt")
+inputs = read_words("italian-words.txt")
+answers = read_words("italian-words.phonetic.txt")
+
+# The random orders to try, as lists of rule indices
+orders = []
+for n in range(number_of_orders):
+	order = list(range(len(rules)))
+	random.shuffle(order)
+	orders.append(order)
+
+def report(label, seconds, scores):
+	print("%s\t%.3f sec\t%.1f orderings/sec\t(total correct: %s)" % (label, seconds, len(scores) / seconds, sum(scores)))
+
+print("Evaluating %s random orders of %s rules on %s words" % (number_of_orders, len(rules), len(inputs)))
+
+# Before: the rules are passed to re.sub as raw strings, every time
+start = time.perf_counter()
+scores = []
+for order in orders:
+	ordered_rules = [rules[i] for i in order]
+	scores.append(count_correct(inputs, answers, ordered_rules, geminates_long))
+report("re.sub strings", time.perf_counter() - start, scores)
+
+# After: the rules are compiled once, and only the order changes
+start = time.perf_counter()
+cascade = RuleCascade(rules, geminates_long, skip_inert=False)
+scores = []
+for order in orders:
+	cascade.reorder(order)
+	scores.append(count_correct(inputs, answers, cascade))
+report("RuleCascade", time.perf_counter() - start, scores)
+
+# And also skipping, for each word, the rules that could never apply to it
+start = time.perf_counter()
+cascade = RuleCascade(rules, geminates_long)
+scores = []
+for order in orders:
+	cascade.reorder(order)
+	scores.append(count_correct(inputs, answers, cascade))
+report("skipping inert", time.perf_counter() - start, scores)
+
+# And also giving up on each order at its first wrong word, checking the words that fail most often first (as the exhaustive and random sample scripts do, since they only need to know whether everything is right)
+start = time.perf_counter()
+failure_order = FailureOrder(len(inputs))
+scores = []
+for order in orders:
+	cascade.reorder(order)
+	scores.append(int(all_correct(inputs, answers, cascade, failure_order=failure_order)))
+report("early exit", time.perf_counter() - start, scores)
+
+# Scoring the whole list of orders as a batch, so that what the orders have in common for each word is only worked out once
+start = time.perf_counter()
+scorer = OrderScorer(cascade, inputs, answers)
+scores = scorer.score_orders(orders)
+report("batched", time.perf_counter() - start, scores)
+
+# And as a batch, giving up on each order at its first wrong word
+start = time.perf_counter()
+scorer = OrderScorer(cascade, inputs, answers)
+scores = [int(score == len(inputs)) for score in scorer.score_orders(orders, stop_below=len(inputs))]
+report("batched, early exit", time.perf_counter() - start, scores)
+
+# Swap proposals, as in the hill-climbing and random walk scripts: starting from one random order, propose swapping two random rules.
+# The swaps to propose, as pairs of positions
+swaps = [random.sample(range(len(rules)), 2) for n in range(number_of_orders)]
+print("\nProposing %s random swaps of two rules" % number_of_orders)
+
+# Before: every proposal re-runs the whole cascade on every word
+start = time.perf_counter()
+cascade.reorder(orders[0])
+scores = []
+for i, j in swaps:
+	new_order = orders[0].copy()
+	new_order[i], new_order[j] = new_order[j], new_order[i]
+	cascade.reorder(new_order)
+	scores.append(count_correct(inputs, answers, cascade))
+report("full cascade", time.perf_counter() - start, scores)
+
+# After: only the part of each derivation from the first swapped rule onward is recomputed
+start = time.perf_counter()
+cascade.reorder(orders[0])
+evaluator = IncrementalEvaluator(cascade, inputs, answers)
+scores = []
+for i, j in swaps:
+	scores.append(evaluator.propose_swap(i, j))
+report("incremental", time.perf_counter() - start, scores)
+
+# And also giving up on each proposal as soon as it can't be an improvement (as the hill-climbing scripts do when they only keep better orders). The scores here are only upper bounds for the proposals that were given up on
+start = time.perf_counter()
+cascade.reorder(orders[0])
+evaluator = IncrementalEvaluator(cascade, inputs, answers)
+scores = []
+for i, j in swaps:
+	scores.append(evaluator.propose_swap(i, j, evaluator.number_correct + 1))
+report("incremental, early exit", time.perf_counter() - start, scores)
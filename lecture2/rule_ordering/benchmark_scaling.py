@@ -0,0 +1,74 @@
+# A benchmark for how the rule ordering searches scale: how long does each one take to find a consistent order, as the number of rules and the number of words grow?
+# The problems are made up by synthetic_rules.py, so that they can be as big as we like and are known to have a consistent order. Each method is run on each problem, and the time it took (or the time limit, if it didn't finish) is written out as a tab-separated file, one line per run, which can be plotted as curves of time against problem size.
+# Usage: python benchmark_scaling.py [output file]
+import sys
+import time
+import random
+
+from transliterate import RuleCascade
+from synthetic_rules import make_problem
+from search_strategies import strategies, run_trial
+from rule_order_solver import solve_rule_order
+from permutation_search import parallel_exhaustive_search
+
+if len(sys.argv) > 1:
+	output_filename = sys.argv[1]
+else:
+	output_filename = "benchmark_scaling.txt"
+
+# The problem sizes, as (number of rules, number of words): first with more and more rules for a fixed number of words, and then with more and more words for a fixed number of rules
+sizes = [(8, 100), (16, 100), (32, 100), (64, 100), (128, 100)]
+sizes += [(32, 25), (32, 50), (32, 200), (32, 400), (32, 800)]
+interaction_density = 0.5
+# How many different problems (seeds) of each size to try
+repeats = 3
+# The search strategies to time: every one in search_strategies.py, with its default options, as (strategy name, options, interacting_only). The ones that work by swapping two rules are timed twice, the second time only swapping rules that could interact (as the PotentialInteraction scripts do); random_samples shuffles whole orders, so that would make no difference to it
+strategy_list = []
+for strategy in strategies:
+	strategy_list.append((strategy, {}, False))
+	if strategy != "random_samples":
+		strategy_list.append((strategy, {}, True))
+# How long to give each one before giving up
+max_seconds = 10
+# The exhaustive search takes n! steps, so it's only tried on small problems
+max_exhaustive_rules = 8
+
+columns = ["rules", "words", "interaction_density", "seed", "method", "interacting_only", "solved", "seconds", "iterations"]
+output_file = open(output_filename, 'w')
+output_file.write("\t".join(columns) + "\n")
+
+def report(number_of_rules, number_of_words, seed, method, interacting_only, solved, seconds, iterations):
+	row = [number_of_rules, number_of_words, interaction_density, seed, method, interacting_only, solved, "%.4f" % seconds, iterations]
+	output_file.write("\t".join(str(value) for value in row) + "\n")
+	output_file.flush()
+	if interacting_only:
+		method += " (interacting only)"
+	message = "%s rules, %s words, seed %s\t%s\t%s\t%.3f sec" % (number_of_rules, number_of_words, seed, method, "solved" if solved else "not solved", seconds)
+	if iterations != "":
+		message += "\t%s iterations" % iterations
+	print(message)
+
+for number_of_rules, number_of_words in sizes:
+	for seed in range(repeats):
+		rules, inputs, answers, consistent_order = make_problem(number_of_rules, number_of_words, interaction_density, seed=seed)
+
+		for strategy, options, interacting_only in strategy_list:
+			statistics = run_trial(strategy, options, rules, False, inputs, answers, seed, max_seconds=max_seconds, interacting_only=interacting_only)
+			report(number_of_rules, number_of_words, seed, strategy, interacting_only, statistics["solved"], statistics["seconds"], statistics["iterations"])
+
+		# The constraint solver, starting from a random order
+		cascade = RuleCascade(rules)
+		order = list(range(number_of_rules))
+		random.Random(seed).shuffle(order)
+		cascade.reorder(order)
+		start = time.perf_counter()
+		order, number_correct, conflicts = solve_rule_order(cascade, inputs, answers)
+		report(number_of_rules, number_of_words, seed, "solver", False, number_correct == len(inputs), time.perf_counter() - start, "")
+
+		if number_of_rules <= max_exhaustive_rules:
+			start = time.perf_counter()
+			order, number_searched = parallel_exhaustive_search(rules, inputs, answers, False, processes=1, verbose=False)
+			report(number_of_rules, number_of_words, seed, "exhaustive", False, order is not None, time.perf_counter() - start, number_searched)
+
+output_file.close()
+print("Results written to %s" % output_filename)
@@ -0,0 +1,25 @@
+# A check that the parallel exhaustive search gives the same answer when it is run again with the same checkpoint file: the second run has to find the same consistent order as the first (not skip the range it was found in, and report that there isn't one).
+# It runs the search on some made-up rule ordering problems (see synthetic_rules.py), twice each with a checkpoint file in a temporary directory, and exits with an error if any of the second runs differs from the first
+import os
+import sys
+import tempfile
+
+from synthetic_rules import make_problem
+from permutation_search import parallel_exhaustive_search
+
+differences = 0
+checkpoint_directory = tempfile.TemporaryDirectory()
+for seed in range(3):
+	rules, inputs, answers, known_order = make_problem(7, 30, seed=seed)
+	checkpoint_filename = os.path.join(checkpoint_directory.name, "checkpoint%s.json" % seed)
+	first_order, first_searched = parallel_exhaustive_search(rules, inputs, answers, False, processes=2, shard_size=100, checkpoint_filename=checkpoint_filename, verbose=False)
+	second_order, second_searched = parallel_exhaustive_search(rules, inputs, answers, False, processes=2, shard_size=100, checkpoint_filename=checkpoint_filename, verbose=False)
+	if first_order is None or second_order != first_order:
+		differences += 1
+		print("Problem %s: the first run found %s (after %s orders), but running it again from the checkpoint found %s (after %s orders)" % (seed, first_order, first_searched, second_order, second_searched))
+checkpoint_directory.cleanup()
+
+if differences:
+	print("%s differences found" % differences)
+	sys.exit(1)
+print("Running the search again from its checkpoint found the same order every time")
@@ -0,0 +1,65 @@
+# A check that skipping inert rules (RuleCascade with skip_inert=True, the default) never changes what the rules make of a word: every rule that skip_inert leaves out for a word must be one that could never have applied to it.
+# It compares the output with and without skipping for random orders of the Italian rules on the Italian words, and for some made-up rules whose left sides are harder to analyse (case-insensitive patterns, wildcards, groups and alternatives) on some made-up words. It prints every word on which the two differ, and exits with an error if there are any
+import sys
+import random
+
+from transliterate import RuleCascade
+from rule_interactions import interaction_graph
+from rule_files import read_rules, read_words
+
+# How many random orders to try, and with what random seed
+if len(sys.argv) > 1:
+	number_of_orders = int(sys.argv[1])
+else:
+	number_of_orders = 200
+random.seed(981)
+
+# The made-up rules and words: the words are spelled in both upper and lower case, so that the case-insensitive rules have something to apply to that their left sides don't mention
+made_up_rules = [
+	["(?i)a", "x"],
+	["(?i:[a-c])d", "y"],
+	["(?i)e(?-i:f)", "z"],
+	["(?:(?i:g)|h)i", "w"],
+	["(?i:s)t", "v"],
+	["c", "A"],
+	["x.", "B"],
+	["[^a-z]q", "D"],
+	["(?i)(?:o|u)+n", "E"],
+]
+made_up_words = ["a", "A", "Bd", "bd", "eF", "Ef", "Gi", "hi", "Hi", "ſt", "St", "cd", "xq", "Aq", "Oun", "uUn", "ON", "cat", "DOG", "fish"]
+
+differences = 0
+def compare(label, rules, words, orders):
+	global differences
+	skipping = RuleCascade(rules)
+	plain = RuleCascade(rules, skip_inert=False)
+	for order in orders:
+		skipping.reorder(order)
+		plain.reorder(order)
+		for word in words:
+			if skipping.apply(word) != plain.apply(word):
+				differences += 1
+				print("%s: %s becomes %s when skipping inert rules, but %s when not (order %s)" % (label, word, skipping.apply(word), plain.apply(word), order))
+
+def random_orders(number_of_rules):
+	orders = [list(range(number_of_rules))]
+	for n in range(number_of_orders):
+		order = list(range(number_of_rules))
+		random.shuffle(order)
+		orders.append(order)
+	return orders
+
+rules = read_rules("ItalianRules.txt")
+inputs = read_words("italian-words.txt")
+compare("Italian", rules, inputs, random_orders(len(rules)))
+compare("Made up", made_up_rules, made_up_words, random_orders(len(made_up_rules)))
+
+# The interaction graph comes from the same analysis, so it should also find that c -> A feeds (?i)a -> x
+if (0, 5) not in interaction_graph(RuleCascade(made_up_rules), made_up_words):
+	differences += 1
+	print("Made up: the interaction graph is missing the rules %s and %s" % (made_up_rules[0], made_up_rules[5]))
+
+if differences:
+	print("%s differences found" % differences)
+	sys.exit(1)
+print("Skipping inert rules made no difference (%s random orders)" % number_of_orders)
@@ -1,15 +1,180 @@
-from transliterate import transliterate
-def count_correct(inputs, answers, rules, geminates_long):
+from transliterate import transliterate, RuleCascade
+
+# The searches often only need to know whether a candidate order is good enough, and a word that got a wrong answer recently is likely to get a wrong answer again. This keeps track of how often each word has failed lately, so that the words that fail most can be checked first (and a bad candidate can be rejected as soon as possible).
+class FailureOrder:
+	def __init__(self, number_of_words, decay=0.9):
+		self.failures = [0.0] * number_of_words
+		# The order in which to check the words
+		self.order = list(range(number_of_words))
+		# Older failures count for less: each new failure counts 1/decay times as much as the one before (which is the same as shrinking all the old counts by the decay factor)
+		self.decay = decay
+		self.weight = 1.0
+		self.changed = False
+
+	def record(self, i):
+		self.failures[i] += self.weight
+		self.changed = True
+
+	def update(self):
+		# Put the words that have failed most recently and most often first. (Call this after recording a round of failures)
+		if self.changed:
+			self.order.sort(key=lambda i: -self.failures[i])
+			self.changed = False
+		self.weight /= self.decay
+		# Keep the numbers from growing without bound
+		if self.weight > 1e100:
+			self.failures = [failures / self.weight for failures in self.failures]
+			self.weight = 1.0
+
+# The rules can either be a list of [left side, right side] rules, or a RuleCascade (in which case, the cascade's own geminate setting is used)
+# If stop_below is given, we give up as soon as it's clear that fewer than stop_below words can be correct, and return the most that could have been correct (which is less than stop_below)
+# If a FailureOrder is given, the words are checked in that order, and the failures are recorded in it
+def count_correct(inputs, answers, rules, geminates_long=False, stop_below=None, failure_order=None):
+	if failure_order is None:
+		word_order = range(0,len(inputs))
+	else:
+		word_order = failure_order.order
 	number_correct = 0;
-	for i in range(0,len(inputs)):
-		word = transliterate(inputs[i], rules, geminates_long)
+	number_remaining = len(inputs)
+	for i in word_order:
+		number_remaining -= 1
+		if isinstance(rules, RuleCascade):
+			word = rules.apply(inputs[i])
+		else:
+			word = transliterate(inputs[i], rules, geminates_long)
 		answer = answers[i]
 
 		if (word == answer):
 			number_correct += 1
 #			print( "[%s] == [%s]" % (word, answer))
-#		else:
+		else:
 #			print( "[%s] != [%s]" % (word, answer))
+			if failure_order is not None:
+				failure_order.record(i)
+			if stop_below is not None and number_correct + number_remaining < stop_below:
+				number_correct += number_remaining
+				break
 
+	if failure_order is not None:
+		failure_order.update()
 #	wait = input("Press <ENTER> to continue")
-	return number_correct
\ No newline at end of file
+	return number_correct
+
+# Does this order get every word right? (This stops at the first word it gets wrong)
+def all_correct(inputs, answers, rules, geminates_long=False, failure_order=None):
+	return count_correct(inputs, answers, rules, geminates_long, stop_below=len(inputs), failure_order=failure_order) == len(inputs)
+
+# When a search only swaps two rules at a time, most of the work of re-running the whole cascade is wasted: the rules before the first swapped rule are unchanged, so their outputs are too.
+# This keeps, for each word, its intermediate form after every position in the cascade, so that after swapping the rules at positions i < j, only positions i onward need to be recomputed.
+class IncrementalEvaluator:
+	def __init__(self, cascade, inputs, answers):
+		self.cascade = cascade
+		self.inputs = inputs
+		self.answers = answers
+		# The words are checked in order of how often they have failed lately, so that proposals can be rejected early
+		self.failure_order = FailureOrder(len(inputs))
+		self.evaluate(cascade.order)
+
+	def finish(self, form):
+		# The output for a form that has been through the whole cascade
+		return self.cascade.finish(form)
+
+	def evaluate(self, order):
+		# Run the whole cascade from scratch, remembering every intermediate form
+		self.cascade.reorder(order)
+		self.order = list(order)
+		# forms[w][k] is the form of word w after the first k rules have applied (so forms[w][0] is the input)
+		self.forms = []
+		self.correct = []
+		# Which rules could ever apply to each word (if the cascade skips rules that can't)
+		if self.cascade.skip_inert:
+			self.masks = [self.cascade.firing_mask(word) for word in self.inputs]
+		else:
+			self.masks = [(1 << len(self.cascade.rules)) - 1 for word in self.inputs]
+		for w in range(len(self.inputs)):
+			form = self.inputs[w]
+			forms = [form]
+			mask = self.masks[w]
+			for r in self.order:
+				if mask >> r & 1:
+					sub, replacement = self.cascade.compiled[r]
+					form = sub(replacement, form)
+				forms.append(form)
+			self.forms.append(forms)
+			self.correct.append(self.finish(form) == self.answers[w])
+		self.number_correct = sum(self.correct)
+		self.pending = None
+		return self.number_correct
+
+	def propose_swap(self, i, j, stop_below=None):
+		# Work out how many words would be correct if the rules at positions i and j were swapped, without actually changing anything yet (call accept() to keep it)
+		# If stop_below is given, give up as soon as it's clear that fewer than stop_below words can be correct, and return the most that could have been correct (such a proposal can't be accepted)
+		if i > j:
+			i, j = j, i
+		new_order = self.order.copy()
+		new_order[i], new_order[j] = new_order[j], new_order[i]
+		compiled = self.cascade.compiled
+		swapped_rules = (1 << new_order[i]) | (1 << new_order[j])
+
+		new_number_correct = self.number_correct
+		# How many of the words we haven't looked at yet are wrong now (each of those could become right)
+		wrong_remaining = len(self.inputs) - self.number_correct
+		# The recomputed part of each word's derivation, and whether the word is now correct
+		tails = [([], now_correct) for now_correct in self.correct]
+		for w in self.failure_order.order:
+			mask = self.masks[w]
+			if not self.correct[w]:
+				wrong_remaining -= 1
+			# If neither of the swapped rules can ever apply to this word, swapping them can't change anything
+			if not mask & swapped_rules:
+				continue
+			forms = self.forms[w]
+			form = forms[i]
+			tail = []
+			reached_end = True
+			for k in range(i, len(new_order)):
+				r = new_order[k]
+				if mask >> r & 1:
+					sub, replacement = compiled[r]
+					form = sub(replacement, form)
+				tail.append(form)
+				# After position j, the same rules apply as before; so if the form is back to what it was, the rest of the derivation is unchanged
+				if k >= j and form == forms[k+1]:
+					reached_end = False
+					break
+
+			if reached_end:
+				now_correct = (self.finish(form) == self.answers[w])
+				new_number_correct += now_correct - self.correct[w]
+			else:
+				now_correct = self.correct[w]
+			tails[w] = (tail, now_correct)
+
+			if not now_correct:
+				self.failure_order.record(w)
+				if stop_below is not None and new_number_correct + wrong_remaining < stop_below:
+					self.failure_order.update()
+					self.pending = None
+					return new_number_correct + wrong_remaining
+
+		self.failure_order.update()
+		self.pending = (new_order, i, tails, new_number_correct)
+		return new_number_correct
+
+	def accept(self):
+		# Keep the most recently proposed swap
+		new_order, i, tails, new_number_correct = self.pending
+		for w in range(len(self.inputs)):
+			tail, now_correct = tails[w]
+			self.forms[w][i+1:i+1+len(tail)] = tail
+			self.correct[w] = now_correct
+		self.order = new_order
+		self.number_correct = new_number_correct
+		self.cascade.reorder(new_order)
+		self.pending = None
+		return self.number_correct
+
+	def swap(self, i, j):
+		# Swap the rules at positions i and j, and return the new number correct
+		self.propose_swap(i, j)
+		return self.accept()
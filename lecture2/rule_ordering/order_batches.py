@@ -0,0 +1,127 @@
+# Scoring many rule orders at once, rather than one at a time.
+# Most of the rules can never apply to a given word, so as far as that word is concerned, an order is just the sequence of the handful of rules that could apply to it. Different orders very often agree on that sequence (or on the start of it), so we keep a trie of the sequences seen so far: each node is a form of a word, and its children are the forms that applying each rule to it gives. A sequence that shares a prefix with one seen before only has to apply the rules after the shared part, and a sequence that has been seen before in full doesn't have to apply any rules at all.
+# Most rules don't change most forms, so sequences that differ only in rules that did nothing lead to the same form. The trie is kept by form, so those branches are merged back together, and the rules after them are only applied once.
+# The orders can also be split into batches and handed out to several processes.
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from transliterate import RuleCascade
+from count_correct import FailureOrder
+
+class OrderScorer:
+	def __init__(self, cascade, inputs, answers, max_cached=200000):
+		self.cascade = cascade
+		self.inputs = inputs
+		self.answers = answers
+		# If a word sees more than this many different sequences of rules, or the trie gets more than this many forms, they are thrown away and started again (so that memory doesn't run out)
+		self.max_cached = max_cached
+		number_of_rules = len(cascade.rules)
+		if number_of_rules > 256:
+			raise ValueError("Orders are stored as bytes, so there can be at most 256 rules (not %s)" % number_of_rules)
+
+		# Words that could be affected by the same rules see the same sequence of rules in every order, so they are grouped together.
+		# For each group: the rules that can't apply to them (as bytes, so that they can be deleted from an order in one step), and the words in the group
+		groups = {}
+		for w in range(len(inputs)):
+			if cascade.skip_inert:
+				mask = cascade.firing_mask(inputs[w])
+			else:
+				mask = (1 << number_of_rules) - 1
+			groups.setdefault(mask, []).append(w)
+		self.groups = []
+		for mask, words in groups.items():
+			inert = bytes(r for r in range(number_of_rules) if not mask >> r & 1)
+			self.groups.append((inert, words))
+		# When only orders that are good enough are of interest, the groups with words that have been failing most are checked first (see score())
+		self.failure_order = FailureOrder(len(self.groups))
+
+		# The trie, as a dictionary of form -> {rule: the form after applying it}, shared by all of the words; and for each word, whether each complete sequence gets it right
+		self.trie = {}
+		self.results = [{} for w in range(len(inputs))]
+
+	def word_correct(self, w, sequence):
+		# Does this sequence of rules (as bytes) get word w right?
+		results = self.results[w]
+		if sequence in results:
+			return results[sequence]
+		if len(results) >= self.max_cached:
+			results.clear()
+		if len(self.trie) >= self.max_cached:
+			self.trie = {}
+		# Follow the trie as far as this sequence has been seen before, and then extend it
+		trie = self.trie
+		form = self.inputs[w]
+		for r in sequence:
+			children = trie.get(form)
+			if children is None:
+				children = trie[form] = {}
+			new_form = children.get(r)
+			if new_form is None:
+				sub, replacement = self.cascade.compiled[r]
+				new_form = children[r] = sub(replacement, form)
+			form = new_form
+		correct = (self.cascade.finish(form) == self.answers[w])
+		results[sequence] = correct
+		return correct
+
+	def score(self, order, stop_below=None):
+		# The number of words that this order gets right.
+		# If stop_below is given, give up as soon as it's clear that fewer than stop_below words can be correct, and return the most that could have been correct (which is less than stop_below)
+		order = bytes(order)
+		if stop_below is None:
+			number_correct = 0
+			for inert, words in self.groups:
+				sequence = order.translate(None, inert)
+				for w in words:
+					number_correct += self.word_correct(w, sequence)
+			return number_correct
+
+		number_possible = len(self.inputs)
+		for g in self.failure_order.order:
+			inert, words = self.groups[g]
+			sequence = order.translate(None, inert)
+			group_wrong = 0
+			for w in words:
+				if not self.word_correct(w, sequence):
+					group_wrong += 1
+			if group_wrong:
+				self.failure_order.record(g)
+				number_possible -= group_wrong
+				if number_possible < stop_below:
+					break
+		self.failure_order.update()
+		return number_possible
+
+	def score_orders(self, orders, stop_below=None):
+		return [self.score(order, stop_below) for order in orders]
+
+
+# Each worker process builds its own cascade and scorer once, when it starts (and keeps its trie from one batch to the next)
+def init_worker(rules, geminates_long, inputs, answers):
+	global worker_scorer
+	worker_scorer = OrderScorer(RuleCascade(rules, geminates_long), inputs, answers)
+
+def score_batch(orders):
+	return worker_scorer.score_orders(orders)
+
+# Score a list of orders (each a list of rule indices into the cascade's rules), using several processes if asked to.
+# Returns the number of words each order gets right, in the same order as the orders were given
+def score_orders(cascade, inputs, answers, orders, processes=1, batch_size=1000):
+	if processes is None:
+		processes = os.cpu_count()
+	if processes == 1 or len(orders) <= batch_size:
+		return OrderScorer(cascade, inputs, answers).score_orders(orders)
+
+	# Workers are started by forking where possible, so that the calling script isn't re-run in each worker
+	if "fork" in multiprocessing.get_all_start_methods():
+		context = multiprocessing.get_context("fork")
+	else:
+		context = multiprocessing.get_context()
+	batches = [orders[start:start + batch_size] for start in range(0, len(orders), batch_size)]
+	executor = ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_worker, initargs=(cascade.rules, cascade.geminates_long, inputs, answers))
+	scores = []
+	for batch_scores in executor.map(score_batch, batches):
+		scores.extend(batch_scores)
+	executor.shutdown()
+	return scores
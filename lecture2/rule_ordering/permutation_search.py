@@ -0,0 +1,178 @@
+# Exhaustive search through rule orders, split up across several processes.
+# The n! orders of n rules are numbered in lexicographic order (rank 0 is 0,1,...,n-1 and rank n!-1 is n-1,...,1,0), so the search space can be cut into ranges of ranks, and each range can be handed to a different process.
+# The ranges that have been searched can also be saved to a checkpoint file, so that an interrupted search can pick up where it left off. Once a consistent order is found, it is saved in the checkpoint too, so that running the search again gives the same order straight away (rather than skipping the range it was found in).
+import os
+import json
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from transliterate import RuleCascade
+from count_correct import all_correct, FailureOrder
+
+# Find the permutation of range(n) with a given lexicographic rank
+def unrank_permutation(rank, n):
+	items = list(range(n))
+	permutation = []
+	for position in range(n, 0, -1):
+		# Each choice of item at this position accounts for (position-1)! permutations of the rest
+		block = math.factorial(position - 1)
+		index, rank = divmod(rank, block)
+		permutation.append(items.pop(index))
+	return permutation
+
+# The reverse: find the lexicographic rank of a permutation of range(n)
+def rank_permutation(permutation):
+	items = sorted(permutation)
+	rank = 0
+	for position in range(len(permutation)):
+		index = items.index(permutation[position])
+		rank += index * math.factorial(len(items) - 1)
+		items.pop(index)
+	return rank
+
+# Change a permutation (in place) into the next one in lexicographic order. Returns False if it was already the last one
+def next_permutation(permutation):
+	# Find the rightmost position that is smaller than the one after it
+	i = len(permutation) - 2
+	while i >= 0 and permutation[i] >= permutation[i+1]:
+		i -= 1
+	if i < 0:
+		return False
+	# Swap it with the rightmost thing that is larger than it, and put everything after it back in increasing order
+	j = len(permutation) - 1
+	while permutation[j] <= permutation[i]:
+		j -= 1
+	permutation[i], permutation[j] = permutation[j], permutation[i]
+	permutation[i+1:] = reversed(permutation[i+1:])
+	return True
+
+
+# Each worker process builds its own copy of the cascade once, when it starts
+def init_worker(rules, geminates_long, inputs, answers, found_event):
+	global worker_cascade, worker_inputs, worker_answers, worker_found
+	worker_cascade = RuleCascade(rules, geminates_long)
+	worker_inputs = inputs
+	worker_answers = answers
+	worker_found = found_event
+	# Each worker learns for itself which words tend to fail, and checks those first
+	global worker_failure_order
+	worker_failure_order = FailureOrder(len(inputs))
+
+# How often (in orders) a worker checks whether some other worker has already succeeded
+check_every = 500
+
+# Search the orders with ranks from start up to (but not including) end.
+# Returns the range that was actually covered (which is shorter than asked for if the search was cancelled or succeeded partway through), and the consistent order if one was found
+def search_range(start, end):
+	order = unrank_permutation(start, len(worker_cascade.rules))
+	for rank in range(start, end):
+		if (rank - start) % check_every == 0 and worker_found.is_set():
+			return (start, rank, None)
+		worker_cascade.reorder(order)
+		if all_correct(worker_inputs, worker_answers, worker_cascade, failure_order=worker_failure_order):
+			worker_found.set()
+			return (start, rank + 1, order)
+		next_permutation(order)
+	return (start, end, None)
+
+
+# The covered ranges are kept as a sorted list of non-overlapping [start, end) pairs
+def add_range(covered, start, end):
+	if end <= start:
+		return covered
+	merged = []
+	for old_start, old_end in sorted(covered + [[start, end]]):
+		if merged and old_start <= merged[-1][1]:
+			merged[-1][1] = max(merged[-1][1], old_end)
+		else:
+			merged.append([old_start, old_end])
+	return merged
+
+# Cut the ranks that are not covered yet into shards of (at most) shard_size orders
+def uncovered_shards(covered, total, shard_size):
+	position = 0
+	for start, end in covered + [[total, total]]:
+		while position < start:
+			shard_end = min(position + shard_size, start)
+			yield (position, shard_end)
+			position = shard_end
+		position = max(position, end)
+
+# A checkpoint records the rules (in the order that defines the ranks), which ranks have been searched, and the consistent order, once one has been found (or None until then)
+def load_checkpoint(checkpoint_filename):
+	if checkpoint_filename is None or not os.path.isfile(checkpoint_filename):
+		return None
+	checkpoint_file = open(checkpoint_filename, 'r')
+	checkpoint = json.load(checkpoint_file)
+	checkpoint_file.close()
+	return checkpoint
+
+def save_checkpoint(checkpoint_filename, rules, covered, found=None):
+	# Write to a temporary file first, so that an interruption can't leave a half-written checkpoint
+	temporary_filename = checkpoint_filename + ".tmp"
+	checkpoint_file = open(temporary_filename, 'w')
+	json.dump({"rules": rules, "covered": covered, "found": found}, checkpoint_file)
+	checkpoint_file.close()
+	os.replace(temporary_filename, checkpoint_filename)
+
+
+# Search all orders of the rules, using several processes. The ranks are relative to the order of rules given here.
+# Returns the consistent order (as a list of rule indices) if one is found, or None if there isn't one, along with the number of orders searched in this run
+def parallel_exhaustive_search(rules, inputs, answers, geminates_long, processes=None, shard_size=10000, checkpoint_filename=None, verbose=True):
+	if processes is None:
+		processes = os.cpu_count()
+	total = math.factorial(len(rules))
+
+	# If there is a checkpoint for these same rules, skip the ranges it has already covered
+	covered = []
+	checkpoint = load_checkpoint(checkpoint_filename)
+	if checkpoint is not None:
+		if checkpoint["rules"] == [list(rule) for rule in rules]:
+			# If an earlier run already found a consistent order, that's the answer (the range it was found in counts as covered, so it wouldn't be found again)
+			if checkpoint.get("found") is not None:
+				if verbose:
+					print("Checkpoint %s already has a consistent order" % checkpoint_filename)
+				return checkpoint["found"], 0
+			covered = checkpoint["covered"]
+			if verbose:
+				print("Resuming from checkpoint %s: %s of %s orders already searched" % (checkpoint_filename, sum(end - start for start, end in covered), total))
+		elif verbose:
+			print("Checkpoint %s is for a different list of rules; starting over" % checkpoint_filename)
+
+	# Workers are started by forking where possible, so that the calling script isn't re-run in each worker
+	if "fork" in multiprocessing.get_all_start_methods():
+		context = multiprocessing.get_context("fork")
+	else:
+		context = multiprocessing.get_context()
+	found_event = context.Event()
+
+	number_searched = 0
+	consistent_order = None
+	shards = uncovered_shards(covered, total, shard_size)
+	executor = ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_worker, initargs=(rules, geminates_long, inputs, answers, found_event))
+	# Keep only a few shards waiting at a time (there can be far too many to submit them all at once)
+	pending = set()
+	while True:
+		while not found_event.is_set() and len(pending) < 2 * processes:
+			shard = next(shards, None)
+			if shard is None:
+				break
+			pending.add(executor.submit(search_range, *shard))
+		if len(pending) == 0:
+			break
+
+		done, pending = wait(pending, return_when=FIRST_COMPLETED)
+		for future in done:
+			start, end, order = future.result()
+			covered = add_range(covered, start, end)
+			number_searched += end - start
+			if order is not None and consistent_order is None:
+				consistent_order = order
+		if checkpoint_filename is not None:
+			save_checkpoint(checkpoint_filename, rules, covered, consistent_order)
+		if verbose:
+			print("\tSearched %s orders (%s of %s in total)" % (number_searched, sum(end - start for start, end in covered), total))
+
+	executor.shutdown()
+	return consistent_order, number_searched
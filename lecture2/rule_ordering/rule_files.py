@@ -0,0 +1,24 @@
+# Functions for reading in the files used by the rule ordering scripts
+
+# A rules file has one rule per line: the left side and the right side, separated by a tab
+def read_rules(rules_filename):
+	rules = []
+	rules_file = open(rules_filename, 'r')
+	for line in rules_file:
+		line = line.strip("\n")
+		new_rule = line.split("\t")
+		# Add the new rule to the list of rules
+		rules.append(new_rule)
+	rules_file.close()
+	return rules
+
+# A words file (inputs or answers) has whitespace-separated words, possibly several to a line
+def read_words(words_filename):
+	words = []
+	words_file = open(words_filename, 'r')
+	for line in words_file:
+		line = line.strip().lower()
+		# Add this list of elements to the words list
+		words.extend(line.split())
+	words_file.close()
+	return words
@@ -0,0 +1,145 @@
+# Working out which rules could possibly interact, by looking at what their left and right sides contain.
+# Two rules can only interact if one could create or destroy material that the other one looks at, and if there is some word they could both apply to.
+try:
+	from re import _parser as sre_parse
+except ImportError:
+	import sre_parse
+import re
+
+# Regular expression elements that can't match an empty string, but that can match characters we don't try to list (like [^aeiou] or .)
+wildcard_ops = (sre_parse.ANY, sre_parse.NOT_LITERAL)
+
+# Look through a parsed regular expression, and work out which characters a string must contain in order for it to match.
+# The requirement is a list of alternatives (any one of which is enough), and each alternative is a list of sets of characters (the string has to contain at least one character from each set).
+# This is an over-approximation: a string that passes this check might still not match, but a string that fails it can never match.
+# Also returns all of the characters the pattern mentions, and whether it contains any wildcards.
+# Where the pattern ignores case (with (?i), for the whole pattern or for a group), the characters it mentions could match characters that it doesn't mention (and not just their upper and lower case versions: in Unicode, s also matches ſ, for instance), so those parts are treated as wildcards that require nothing
+def analyse_parsed(parsed, ignorecase=False):
+	alternatives = [[]]
+	characters = set()
+	wildcard = False
+	for op, av in parsed:
+		element = [[]]
+		if op == sre_parse.LITERAL:
+			characters.add(chr(av))
+			if ignorecase:
+				wildcard = True
+			else:
+				element = [[frozenset(chr(av))]]
+		elif op == sre_parse.IN:
+			members = set()
+			negated = False
+			for item_op, item_av in av:
+				if item_op == sre_parse.LITERAL:
+					members.add(chr(item_av))
+				elif item_op == sre_parse.RANGE and item_av[1] - item_av[0] < 256:
+					members.update(chr(c) for c in range(item_av[0], item_av[1] + 1))
+				else:
+					# A negated class, a category like \w, or a huge range: anything could match it
+					negated = True
+			characters.update(members)
+			if negated or ignorecase:
+				wildcard = True
+			else:
+				element = [[frozenset(members)]]
+		elif op in wildcard_ops:
+			wildcard = True
+		elif op == sre_parse.BRANCH:
+			element = []
+			for branch in av[1]:
+				branch_alternatives, branch_characters, branch_wildcard = analyse_parsed(branch, ignorecase)
+				element.extend(branch_alternatives)
+				characters.update(branch_characters)
+				wildcard = wildcard or branch_wildcard
+		elif op == sre_parse.SUBPATTERN:
+			# A group can turn ignoring case on or off for just its own contents, as in (?i:...) and (?-i:...)
+			sub_ignorecase = ignorecase
+			if len(av) == 4:
+				if av[1] & sre_parse.SRE_FLAG_IGNORECASE:
+					sub_ignorecase = True
+				if av[2] & sre_parse.SRE_FLAG_IGNORECASE:
+					sub_ignorecase = False
+			element, sub_characters, sub_wildcard = analyse_parsed(av[-1], sub_ignorecase)
+			characters.update(sub_characters)
+			wildcard = wildcard or sub_wildcard
+		elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+			repeated, sub_characters, sub_wildcard = analyse_parsed(av[2], ignorecase)
+			characters.update(sub_characters)
+			wildcard = wildcard or sub_wildcard
+			# If it can be repeated zero times, it doesn't require anything
+			if av[0] > 0:
+				element = repeated
+		# Anything else (anchors, lookarounds, back references) is treated as requiring nothing
+
+		alternatives = [a + b for a in alternatives for b in element]
+		# If there are too many alternatives to keep track of, give up on requiring anything (which is always safe)
+		if len(alternatives) > 64:
+			alternatives = [[]]
+	return alternatives, characters, wildcard
+
+def analyse_pattern(pattern):
+	parsed = sre_parse.parse(pattern)
+	# The flags for the whole pattern (as set by (?i) at its start) are kept with the parsed pattern: in parsed.state in newer versions of Python, and in parsed.pattern in older ones
+	state = getattr(parsed, 'state', None) or parsed.pattern
+	return analyse_parsed(parsed, bool(state.flags & sre_parse.SRE_FLAG_IGNORECASE))
+
+# Could a string made up of the given characters match a pattern with this requirement?
+def can_match(requirement, characters):
+	for alternative in requirement:
+		if all(not needed.isdisjoint(characters) for needed in alternative):
+			return True
+	return False
+
+# The characters that the right side of a rule can put into a word. References to groups (\1, \g<name>) only copy material that was already in the word, so they don't add anything new
+def replacement_characters(replacement):
+	replacement = re.sub(r'\\(\d+|g<[^>]*>)', '', replacement)
+	replacement = re.sub(r'\\(.)', r'\1', replacement)
+	return set(replacement)
+
+
+# The analysis of each rule in a cascade
+class RuleAnalysis:
+	def __init__(self, rule):
+		self.requirement, self.characters, self.wildcard = analyse_pattern(rule[0])
+		self.outputs = replacement_characters(rule[1])
+		# A rule that can take away material (rather than just rewriting it) can bring things together that weren't next to each other before. We count each group reference in the right side as one character, and compare with the shortest string the left side can match
+		group_references = re.findall(r'\\(\d+|g<[^>]*>)', rule[1])
+		replacement_length = len(re.sub(r'\\(\d+|g<[^>]*>)', '', rule[1])) + len(group_references)
+		self.deletes = replacement_length < sre_parse.parse(rule[0]).getwidth()[0]
+
+def analyse_rules(cascade):
+	return [RuleAnalysis(rule) for rule in cascade.rules]
+
+# Which rules could ever apply to a word, at any point in any order? A rule could apply if the characters it needs are in the word, or could be put there by other rules that could apply. (Rules can also remove characters, but ignoring that only means we over-estimate.)
+# Returns a bitmask, in which bit r is set if rule r could apply
+def firing_mask(analyses, word):
+	characters = set(word)
+	mask = 0
+	changed = True
+	while changed:
+		changed = False
+		for r in range(len(analyses)):
+			if not mask >> r & 1 and can_match(analyses[r].requirement, characters):
+				mask |= 1 << r
+				characters |= analyses[r].outputs
+				changed = True
+	return mask
+
+# Could two rules interact, judging only by their left and right sides?
+def could_interact(first, second):
+	if first.wildcard or second.wildcard or first.deletes or second.deletes:
+		return True
+	# One could create material the other one looks at, or they could both be looking at the same material
+	return not (first.outputs.isdisjoint(second.characters) and second.outputs.isdisjoint(first.characters) and first.characters.isdisjoint(second.characters))
+
+# The pairs of rules (a, b), with a < b, that could interact on at least one of the words
+def interaction_graph(cascade, words):
+	analyses = analyse_rules(cascade)
+	masks = set(firing_mask(analyses, word) for word in words)
+	edges = []
+	for a in range(len(analyses)):
+		for b in range(a+1, len(analyses)):
+			pair = (1 << a) | (1 << b)
+			if could_interact(analyses[a], analyses[b]) and any(mask & pair == pair for mask in masks):
+				edges.append((a, b))
+	return edges
@@ -0,0 +1,234 @@
+# Rather than searching blindly through orders of the rules, this tries to work out which rules must precede which, and then reads an order off of those requirements.
+# Each word is only affected by a handful of rules, so for each word we can try every order of just the rules that could apply to it, and see which ones derive the right answer. If rule A precedes rule B in all of the orders that work, then A must precede B.
+# These "A must precede B" requirements form a graph. If the graph has no cycles, any topological order of it satisfies them all; if it does have cycles, the rules on a cycle make conflicting demands, and we fall back to local search, but only among those rules.
+import heapq
+import random
+
+from count_correct import IncrementalEvaluator
+
+# The rules that could apply to a word, in any order: starting from the word, apply every rule that changes it (each rule at most once per derivation), and keep going from the results.
+# Returns None if there are too many possible intermediate forms to keep track of
+def rules_applying(cascade, word, max_states=100000):
+	start = (word, 0)
+	seen = set([start])
+	frontier = [start]
+	applying = set()
+	# Only the rules that could ever apply to this word need to be tried
+	candidates = [r for r in range(len(cascade.rules)) if cascade.firing_mask(word) >> r & 1]
+	while frontier:
+		new_frontier = []
+		for form, used in frontier:
+			for r in candidates:
+				# The rules that have already applied in this derivation are marked in the bits of "used"
+				if used >> r & 1:
+					continue
+				sub, replacement = cascade.compiled[r]
+				new_form = sub(replacement, form)
+				if new_form != form:
+					applying.add(r)
+					state = (new_form, used | 1 << r)
+					if state not in seen:
+						seen.add(state)
+						new_frontier.append(state)
+		if len(seen) > max_states:
+			return None
+		frontier = new_frontier
+	return applying
+
+# Try every order of the rules that apply to a word, and find the requirements that hold in every order that gets the word right.
+# Returns a set of pairs (a, b), meaning that rule a must precede rule b; or None if no order of these rules derives the answer
+def word_constraints(cascade, word, answer, applying):
+	# Many orders pass through the same intermediate form with the same rules left to apply, so the results are remembered for each (form, remaining rules) state
+	results = {}
+	def requirements(form, remaining):
+		if len(remaining) == 0:
+			if cascade.finish(form) == answer:
+				return set()
+			return None
+		state = (form, remaining)
+		if state in results:
+			return results[state]
+		required = None
+		for r in remaining:
+			sub, replacement = cascade.compiled[r]
+			rest = remaining - frozenset([r])
+			rest_required = requirements(sub(replacement, form), rest)
+			if rest_required is None:
+				continue
+			# In the orders that apply r next, r precedes all of the rest
+			precedes = rest_required | set((r, other) for other in rest)
+			if required is None:
+				required = precedes
+			else:
+				required &= precedes
+		results[state] = required
+		return required
+	return requirements(word, frozenset(applying))
+
+# Collect the requirements from all of the words (other than words affected by more than max_local_rules rules, since trying all of their orders would take too long).
+# Returns a dictionary of requirements: (a, b) -> the number of words that need rule a to precede rule b; and a list of the words that no order can derive
+def precedence_constraints(cascade, inputs, answers, max_local_rules=8):
+	constraints = {}
+	underivable = []
+	for w in range(len(inputs)):
+		applying = rules_applying(cascade, inputs[w])
+		if applying is None or len(applying) > max_local_rules:
+			continue
+		required = word_constraints(cascade, inputs[w], answers[w], applying)
+		if required is None:
+			underivable.append(inputs[w])
+			continue
+		for pair in required:
+			constraints[pair] = constraints.get(pair, 0) + 1
+	return constraints, underivable
+
+# Topological sort of the rules (Kahn's algorithm). When there is a choice, rules keep their relative positions in the given order.
+# Returns None if the graph has a cycle
+def topological_order(order, constraints):
+	position = {r: p for p, r in enumerate(order)}
+	successors = {r: [] for r in order}
+	predecessors = {r: 0 for r in order}
+	for a, b in constraints:
+		successors[a].append(b)
+		predecessors[b] += 1
+	ready = [(position[r], r) for r in order if predecessors[r] == 0]
+	heapq.heapify(ready)
+	sorted_rules = []
+	while ready:
+		p, r = heapq.heappop(ready)
+		sorted_rules.append(r)
+		for s in successors[r]:
+			predecessors[s] -= 1
+			if predecessors[s] == 0:
+				heapq.heappush(ready, (position[s], s))
+	if len(sorted_rules) < len(order):
+		return None
+	return sorted_rules
+
+# The strongly connected components of the graph (Tarjan's algorithm, without recursion). Only components with more than one rule are returned: those are the rules whose requirements conflict
+def conflicting_components(order, constraints):
+	successors = {r: [] for r in order}
+	for a, b in constraints:
+		successors[a].append(b)
+	index = {}
+	lowlink = {}
+	stack = []
+	on_stack = set()
+	components = []
+	counter = 0
+	for root in order:
+		if root in index:
+			continue
+		work = [(root, 0)]
+		while work:
+			r, next_successor = work.pop()
+			if next_successor == 0:
+				index[r] = lowlink[r] = counter
+				counter += 1
+				stack.append(r)
+				on_stack.add(r)
+			recurse = False
+			for k in range(next_successor, len(successors[r])):
+				s = successors[r][k]
+				if s not in index:
+					work.append((r, k+1))
+					work.append((s, 0))
+					recurse = True
+					break
+				elif s in on_stack:
+					lowlink[r] = min(lowlink[r], index[s])
+			if recurse:
+				continue
+			if lowlink[r] == index[r]:
+				component = []
+				while True:
+					s = stack.pop()
+					on_stack.discard(s)
+					component.append(s)
+					if s == r:
+						break
+				if len(component) > 1:
+					components.append(component)
+			if work:
+				parent = work[-1][0]
+				lowlink[parent] = min(lowlink[parent], lowlink[r])
+	return components
+
+# A smallest set of conflicting requirements within a component: the shortest cycle through it (found by breadth-first search from each rule)
+def minimal_conflict(component, constraints):
+	members = set(component)
+	successors = {r: [b for (a, b) in constraints if a == r and b in members] for r in component}
+	best = None
+	for start in component:
+		parent = {start: None}
+		frontier = [start]
+		found = None
+		while frontier and found is None:
+			next_frontier = []
+			for r in frontier:
+				for s in successors[r]:
+					if s == start:
+						found = r
+						break
+					if s not in parent:
+						parent[s] = r
+						next_frontier.append(s)
+				if found is not None:
+					break
+			frontier = next_frontier
+		if found is not None:
+			cycle = []
+			r = found
+			while r is not None:
+				cycle.append(r)
+				r = parent[r]
+			cycle.reverse()
+			if best is None or len(cycle) < len(best):
+				best = cycle
+	return best
+
+# Hill climbing, but only swapping rules in the given set (the rest of the order stays fixed)
+def local_search(evaluator, movable_rules, max_iterations=10000, accept_equal=1):
+	positions = [p for p, r in enumerate(evaluator.order) if r in movable_rules]
+	iterations = 0
+	while evaluator.number_correct < len(evaluator.inputs) and iterations < max_iterations and len(positions) > 1:
+		i, j = random.sample(positions, 2)
+		new_number_correct = evaluator.propose_swap(i, j)
+		if new_number_correct > evaluator.number_correct or (new_number_correct == evaluator.number_correct and random.random() < accept_equal):
+			evaluator.accept()
+		iterations += 1
+	return iterations
+
+# Find an order of the cascade's rules that gets all of the answers right, starting from the cascade's current order.
+# Returns the order (a list of rule indices), the number of words it gets right, and the conflicting sets of rules that had to be resolved by local search (each given as a cycle of rules that must each precede the next)
+def solve_rule_order(cascade, inputs, answers, max_local_rules=8, max_iterations=10000):
+	constraints, underivable = precedence_constraints(cascade, inputs, answers, max_local_rules)
+	for word in underivable:
+		print("Warning! No order of the rules derives the right answer for %s" % word)
+
+	conflicts = []
+	order = topological_order(cascade.order, constraints)
+	if order is None:
+		# The requirements conflict. Set aside the requirements among each group of conflicting rules, so that the rest can be put in order
+		components = conflicting_components(cascade.order, constraints)
+		conflicts = [minimal_conflict(component, constraints) for component in components]
+		movable_rules = set(r for component in components for r in component)
+		outside = {(a, b): count for (a, b), count in constraints.items() if not (a in movable_rules and b in movable_rules)}
+		order = topological_order(cascade.order, outside)
+	else:
+		movable_rules = set()
+
+	evaluator = IncrementalEvaluator(cascade, inputs, answers)
+	evaluator.evaluate(order)
+
+	# If that didn't get everything right, search locally, moving only the conflicting rules and the rules that apply to the words that are still wrong
+	if evaluator.number_correct < len(inputs):
+		for w in range(len(inputs)):
+			if not evaluator.correct[w]:
+				applying = rules_applying(cascade, inputs[w])
+				if applying is not None:
+					movable_rules |= applying
+		local_search(evaluator, movable_rules, max_iterations)
+
+	cascade.reorder(evaluator.order)
+	return evaluator.order, evaluator.number_correct, conflicts
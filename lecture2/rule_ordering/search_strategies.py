@@ -0,0 +1,250 @@
+# A common driver for the different ways of searching for a rule order, so that they can be compared with each other on the same footing.
+# Each strategy is a function that takes a Search (which holds the evaluator, the random number generator, the limits, and the counts of what has been done so far), plus its own options, and changes the order until everything is right or it runs out of time or iterations.
+# Trials are run in separate processes, and the statistics for each trial (iterations, evaluations, wall time, evaluations per second) can be written out as a tab-separated file.
+import os
+import math
+import time
+import random
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from transliterate import RuleCascade
+from count_correct import IncrementalEvaluator
+from order_batches import OrderScorer
+from rule_interactions import interaction_graph
+
+class Search:
+	def __init__(self, cascade, inputs, answers, rng, max_iterations=None, max_seconds=None, interacting_only=False):
+		self.cascade = cascade
+		self.inputs = inputs
+		self.answers = answers
+		self.rng = rng
+		self.max_iterations = max_iterations
+		self.max_seconds = max_seconds
+		self.evaluator = IncrementalEvaluator(cascade, inputs, answers)
+		# If asked, only swap pairs of rules that could interact (as in the PotentialInteraction scripts)
+		self.interacting_pairs = None
+		if interacting_only:
+			self.interacting_pairs = interaction_graph(cascade, inputs)
+		# What has been done so far: an iteration is one step of the search, and an evaluation is one candidate order tried (some strategies try several candidates per step)
+		self.iterations = 0
+		self.evaluations = 0
+		self.start_time = time.perf_counter()
+
+	def solved(self):
+		return self.evaluator.number_correct == len(self.inputs)
+
+	def finished(self):
+		# Stop when everything is right, or when we run out of iterations or time
+		if self.solved():
+			return True
+		if self.max_iterations is not None and self.iterations >= self.max_iterations:
+			return True
+		if self.max_seconds is not None and time.perf_counter() - self.start_time >= self.max_seconds:
+			return True
+		return False
+
+	def random_swap(self):
+		# Two distinct positions in the order to swap
+		if self.interacting_pairs:
+			rule1, rule2 = self.rng.choice(self.interacting_pairs)
+			return self.evaluator.order.index(rule1), self.evaluator.order.index(rule2)
+		return tuple(self.rng.sample(range(len(self.evaluator.order)), 2))
+
+	def propose_swap(self, i, j, stop_below=None):
+		self.evaluations += 1
+		return self.evaluator.propose_swap(i, j, stop_below)
+
+	def restart(self):
+		# Start again from a new random order
+		order = self.evaluator.order.copy()
+		self.rng.shuffle(order)
+		self.evaluator.evaluate(order)
+
+
+# The strategies. Each one returns a dictionary of any statistics of its own (such as the number of restarts), beyond the ones that the Search keeps
+
+# Random samples: score whole random orders, in batches (as in Italian-Learn-RandomSamples.py)
+def random_samples(search, batch_size=1000):
+	scorer = OrderScorer(search.cascade, search.inputs, search.answers)
+	order = search.evaluator.order.copy()
+	while not search.finished():
+		size = batch_size
+		if search.max_iterations is not None:
+			size = min(size, search.max_iterations - search.iterations)
+		batch = []
+		for n in range(size):
+			search.rng.shuffle(order)
+			batch.append(order.copy())
+		scores = scorer.score_orders(batch, stop_below=len(search.inputs))
+		for new_order, number_correct in zip(batch, scores):
+			search.iterations += 1
+			search.evaluations += 1
+			if number_correct == len(search.inputs):
+				search.evaluator.evaluate(new_order)
+				break
+	return {}
+
+# Random walk: swap two rules, and keep the result whatever it is (as in Italian-Learn-RandomWalk2.py)
+def random_walk(search):
+	while not search.finished():
+		i, j = search.random_swap()
+		search.propose_swap(i, j)
+		search.evaluator.accept()
+		search.iterations += 1
+	return {}
+
+# Hill climbing with fixed probabilities of keeping better, equal and worse orders (as in Italian-Learn-HillClimbing.py)
+def hill_climbing(search, accept_better=1, accept_equal=1, accept_worse=0):
+	while not search.finished():
+		i, j = search.random_swap()
+		number_correct = search.evaluator.number_correct
+		# Decide in advance which kinds of change we would keep, so that the proposal can give up as soon as it can't be good enough
+		keep_better = search.rng.random() >= 1-accept_better
+		keep_equal = search.rng.random() >= 1-accept_equal
+		if search.rng.random() > 1-accept_worse:
+			search.propose_swap(i, j)
+			search.evaluator.accept()
+		elif keep_equal or keep_better:
+			stop_below = number_correct if keep_equal else number_correct + 1
+			new_number_correct = search.propose_swap(i, j, stop_below)
+			if (new_number_correct > number_correct and keep_better) or (new_number_correct == number_correct and keep_equal):
+				search.evaluator.accept()
+		search.iterations += 1
+	return {}
+
+# Simulated annealing: a change that loses d correct words is kept with probability exp(-d / temperature), and the temperature falls by the cooling factor on every iteration (down to min_temperature)
+def annealing(search, start_temperature=2.0, cooling=0.999, min_temperature=0.05):
+	temperature = start_temperature
+	while not search.finished():
+		i, j = search.random_swap()
+		number_correct = search.evaluator.number_correct
+		# Drawing the random number first tells us the worst score we would keep: new >= current + temperature * log(u). (1 - random() is never 0, so the log is defined)
+		lowest_kept = number_correct + temperature * math.log(1 - search.rng.random())
+		new_number_correct = search.propose_swap(i, j, math.ceil(lowest_kept))
+		if new_number_correct >= lowest_kept:
+			search.evaluator.accept()
+		temperature = max(temperature * cooling, min_temperature)
+		search.iterations += 1
+	return {"final_temperature": temperature}
+
+# Tabu search: on each iteration, try several random swaps and make the best of them, even if it is worse than the current order. The pairs of rules swapped recently are "tabu", and aren't swapped again until they fall off the end of the list, so that the search doesn't just undo its last few moves
+def tabu(search, tabu_size=10, candidates=8):
+	recent = deque(maxlen=tabu_size)
+	while not search.finished():
+		best = None
+		best_number_correct = -1
+		for c in range(candidates):
+			i, j = search.random_swap()
+			pair = frozenset((search.evaluator.order[i], search.evaluator.order[j]))
+			if pair in recent:
+				continue
+			# Only a candidate better than the best one so far is of interest, so the rest can be given up on early
+			new_number_correct = search.propose_swap(i, j, best_number_correct + 1)
+			if new_number_correct > best_number_correct:
+				best = (i, j, pair)
+				best_number_correct = new_number_correct
+		if best is not None:
+			i, j, pair = best
+			search.propose_swap(i, j)
+			search.evaluator.accept()
+			recent.append(pair)
+		search.iterations += 1
+	return {}
+
+# Hill climbing (keeping better and equal orders) that starts again from a new random order whenever it has gone patience iterations without an improvement
+def random_restarts(search, patience=500):
+	restarts = 0
+	best_number_correct = search.evaluator.number_correct
+	since_improvement = 0
+	while not search.finished():
+		i, j = search.random_swap()
+		number_correct = search.evaluator.number_correct
+		if search.propose_swap(i, j, number_correct) >= number_correct:
+			search.evaluator.accept()
+		if search.evaluator.number_correct > best_number_correct:
+			best_number_correct = search.evaluator.number_correct
+			since_improvement = 0
+		else:
+			since_improvement += 1
+		if since_improvement >= patience and not search.solved():
+			search.restart()
+			restarts += 1
+			best_number_correct = search.evaluator.number_correct
+			since_improvement = 0
+		search.iterations += 1
+	return {"restarts": restarts}
+
+strategies = {
+	"random_samples": random_samples,
+	"random_walk": random_walk,
+	"hill_climbing": hill_climbing,
+	"annealing": annealing,
+	"tabu": tabu,
+	"random_restarts": random_restarts,
+}
+
+
+# Run one trial of a strategy, from a random starting order, and return its statistics
+def run_trial(strategy, options, rules, geminates_long, inputs, answers, seed, max_iterations=None, max_seconds=None, interacting_only=False):
+	rng = random.Random(seed)
+	cascade = RuleCascade(rules, geminates_long)
+	order = list(range(len(rules)))
+	rng.shuffle(order)
+	cascade.reorder(order)
+	search = Search(cascade, inputs, answers, rng, max_iterations, max_seconds, interacting_only)
+	extra = strategies[strategy](search, **options)
+	seconds = time.perf_counter() - search.start_time
+	statistics = {
+		"strategy": strategy,
+		"options": ",".join("%s=%s" % (name, options[name]) for name in sorted(options)),
+		"interacting_only": interacting_only,
+		"seed": seed,
+		"solved": search.solved(),
+		"number_correct": search.evaluator.number_correct,
+		"iterations": search.iterations,
+		"evaluations": search.evaluations,
+		"seconds": seconds,
+		"evaluations_per_second": search.evaluations / seconds if seconds > 0 else 0.0,
+		"extra": ",".join("%s=%s" % (name, extra[name]) for name in sorted(extra)),
+		"order": search.evaluator.order,
+	}
+	return statistics
+
+# Run a number of trials of each of a list of strategies, each given as (strategy name, dictionary of options).
+# Each trial is run in a process from a pool (started by forking where possible, so that the calling script isn't re-run in each worker), and gets its own seed, so that the trials are independent of each other and repeatable.
+# Returns a list of the statistics for each trial, in the order the trials were given
+def run_trials(strategy_list, rules, geminates_long, inputs, answers, trials=10, seed=0, max_iterations=None, max_seconds=None, interacting_only=False, processes=None):
+	if processes is None:
+		processes = os.cpu_count()
+	if "fork" in multiprocessing.get_all_start_methods():
+		context = multiprocessing.get_context("fork")
+	else:
+		context = multiprocessing.get_context()
+	executor = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+	futures = []
+	for strategy, options in strategy_list:
+		for t in range(trials):
+			futures.append(executor.submit(run_trial, strategy, options, rules, geminates_long, inputs, answers, seed + t, max_iterations, max_seconds, interacting_only))
+	results = [future.result() for future in futures]
+	executor.shutdown()
+	for t in range(len(results)):
+		results[t]["trial"] = t % trials
+	return results
+
+# The columns of the statistics file
+statistics_columns = ["strategy", "options", "interacting_only", "trial", "seed", "solved", "number_correct", "iterations", "evaluations", "seconds", "evaluations_per_second", "extra"]
+
+def write_statistics(results, statistics_filename):
+	statistics_file = open(statistics_filename, 'w')
+	statistics_file.write("\t".join(statistics_columns) + "\n")
+	for statistics in results:
+		row = []
+		for column in statistics_columns:
+			value = statistics[column]
+			if isinstance(value, float):
+				value = "%.4f" % value
+			row.append(str(value))
+		statistics_file.write("\t".join(row) + "\n")
+	statistics_file.close()
@@ -0,0 +1,82 @@
+# Made-up rule ordering problems, for seeing how the search scripts cope as the number of rules and words grows.
+# Each rule rewrites one symbol as another, possibly only before a certain context symbol. The rules are made up in a known consistent order, and some of them are made to interact with rules before them in that order:
+#	feeding: the rule rewrites the symbol that an earlier rule produces (so the earlier rule has to go first to give it something to apply to)
+#	bleeding: the rule rewrites the same symbol as an earlier rule (so whichever one goes first takes the symbol away from the other)
+# The words are random strings of the symbols that the rules apply to, and the answers are what the rules in the known order make of them. So the known order is always consistent (though with few words, other orders may be too).
+import re
+import random
+
+from transliterate import RuleCascade
+
+# The symbols used: a few plain letters as filler and context, and then as many more as are needed for the rules (taken from the Latin Extended block, so that they are all single characters)
+filler = "aeiou"
+def symbol(n):
+	return chr(0x100 + n)
+
+# Make up a problem with the given number of rules and words. interaction_density is the chance that each rule (after the first) interacts with an earlier one, and context_density is the chance that it only applies before a context symbol.
+# Returns the rules (in a random order, as [left side, right side] lists, like the ones read from a rules file), the inputs, the answers, and a consistent order (as indices into the returned rules)
+def make_problem(number_of_rules, number_of_words, interaction_density=0.5, context_density=0.3, word_length=(3, 8), seed=0):
+	rng = random.Random(seed)
+	next_symbol = 0
+	# Each rule is (the symbol it rewrites, what it rewrites it as, its context or None)
+	made_rules = []
+	for r in range(number_of_rules):
+		if r > 0 and rng.random() < interaction_density:
+			earlier = rng.choice(made_rules)
+			if rng.random() < 0.5:
+				# Feeding: rewrite what the earlier rule produces
+				target = earlier[1]
+			else:
+				# Bleeding: rewrite what the earlier rule rewrites
+				target = earlier[0]
+		else:
+			target = symbol(next_symbol)
+			next_symbol += 1
+		# The output is always a new symbol, so that the rules can't go round in circles
+		output = symbol(next_symbol)
+		next_symbol += 1
+		context = None
+		if rng.random() < context_density:
+			context = rng.choice(filler)
+		made_rules.append((target, output, context))
+
+	rules = []
+	for target, output, context in made_rules:
+		if context is None:
+			rules.append([re.escape(target), output])
+		else:
+			rules.append([re.escape(target) + "(?=" + context + ")", output])
+
+	# The words are made up of the symbols that some rule rewrites, with filler in between
+	targets = sorted(set(target for target, output, context in made_rules))
+	inputs = []
+	for w in range(number_of_words):
+		length = rng.randint(*word_length)
+		word = ""
+		for k in range(length):
+			if rng.random() < 0.5:
+				word += rng.choice(targets)
+			else:
+				word += rng.choice(filler)
+		inputs.append(word)
+	cascade = RuleCascade(rules)
+	answers = cascade.apply_many(inputs)
+
+	# Hand the rules over in a random order, and work out where the known order's rules ended up
+	shuffled = list(range(number_of_rules))
+	rng.shuffle(shuffled)
+	position = {r: p for p, r in enumerate(shuffled)}
+	consistent_order = [position[r] for r in range(number_of_rules)]
+	return [rules[r] for r in shuffled], inputs, answers, consistent_order
+
+# Write a problem out in the same format as the Italian files, so that the Italian-Learn scripts can be run on it
+def write_problem(rules, inputs, answers, rules_filename, input_filename, check_filename):
+	rules_file = open(rules_filename, 'w')
+	for rule in rules:
+		rules_file.write("\t".join(rule) + "\n")
+	rules_file.close()
+	for filename, words in ((input_filename, inputs), (check_filename, answers)):
+		words_file = open(filename, 'w')
+		for word in words:
+			words_file.write(word + "\n")
+		words_file.close()
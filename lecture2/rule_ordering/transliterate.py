@@ -1,4 +1,5 @@
 import re
+from rule_interactions import analyse_rules, firing_mask
 def transliterate(word, rules, geminates_long=False):
 	for rule in rules:	
 		# Apply them but substituting the left side for the right side
@@ -8,4 +9,64 @@ def transliterate(word, rules, geminates_long=False):
 	if geminates_long:
 		word = re.sub(r"([^aeiou])\1", r"\1ː", word)
 	
-	return word
\ No newline at end of file
+	return word
+
+# The geminate rule is the same for every cascade, so it only needs to be compiled once
+geminate_pattern = re.compile(r"([^aeiou])\1")
+
+# A set of rules that have been compiled once, in advance. The search scripts try out many different orders of the same rules, so rather than handing re.sub the raw strings for every rule on every word (which means a lookup in the regex cache each time), we compile each rule once and then just change the order in which they are applied.
+# Most rules can never apply to most words, so (unless skip_inert is turned off) the cascade also works out, for each word it sees, which rules could ever apply to it in any order, and skips the rest
+class RuleCascade:
+	def __init__(self, rules, geminates_long=False, skip_inert=True):
+		# The rules, in the order in which they were given. A rule is referred to by its index in this list
+		self.rules = [list(rule) for rule in rules]
+		self.geminates_long = geminates_long
+		# The compiled version of each rule: its pattern, and then its substitution function and what to replace the match with
+		self.patterns = [re.compile(rule[0]) for rule in rules]
+		self.compiled = [(self.patterns[r].sub, self.rules[r][1]) for r in range(len(self.rules))]
+		# For skipping rules: what each rule needs and produces, and for each word seen so far, a bitmask of the rules that could apply to it (bit r is set if rule r could)
+		self.skip_inert = skip_inert
+		self.analyses = analyse_rules(self)
+		self.masks = {}
+		# Start out applying the rules in the order they were given
+		self.reorder(range(len(self.rules)))
+
+	def reorder(self, order):
+		# The order is a permutation of the rule indices: order[0] is the index of the rule that applies first, and so on
+		self.order = list(order)
+		self.steps = [self.compiled[i] for i in self.order]
+		# The steps that apply to words with a given mask, in the current order (filled in as they are needed)
+		self.masked_steps = {}
+
+	def firing_mask(self, word):
+		# A bitmask of the rules that could ever apply to this word (a conservative over-estimate: every rule that does apply will be in it)
+		if word not in self.masks:
+			self.masks[word] = firing_mask(self.analyses, word)
+		return self.masks[word]
+
+	def steps_for(self, word):
+		# The steps of the cascade that could apply to this word, in the current order
+		if not self.skip_inert:
+			return self.steps
+		mask = self.firing_mask(word)
+		if mask not in self.masked_steps:
+			self.masked_steps[mask] = [self.compiled[r] for r in self.order if mask >> r & 1]
+		return self.masked_steps[mask]
+
+	def ordered_rules(self):
+		# The rules themselves, in the current order (for instance, to write them out once a consistent order is found)
+		return [self.rules[i] for i in self.order]
+
+	def finish(self, word):
+		# The last step, after all of the rules have applied: if desired, represent geminate consonants as C:
+		if self.geminates_long:
+			word = geminate_pattern.sub(r"\1ː", word)
+		return word
+
+	def apply(self, word):
+		for sub, replacement in self.steps_for(word):
+			word = sub(replacement, word)
+		return self.finish(word)
+
+	def apply_many(self, words):
+		return [self.apply(word) for word in words]
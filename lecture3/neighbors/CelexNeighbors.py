@@ -1,45 +1,59 @@
-# File to count the number of neighbors of test words
-import re
+# File to count the number of neighbors of test words, and how frequent they are
+# Each line of the output has a test word, the number of its neighbors, the neighbors, their summed frequency, and their summed log frequency (see NeighborTools.Lexicon); and if the GNM is used, the word's GNM similarity, the same divided by the size of the corpus, and its five nearest neighbors (with their frequencies and distances), as in GNM/GNM.pl
+from NeighborTools import DeletionIndex, LexiconTrie, read_celex_lemmas, read_similarity_table, SegmentCosts, GNMScorer, gnm_scores
 
 celex_filename = "CelexLemmasInTranscription-DISC.txt"
-celex = open(celex_filename, 'r')
 
 test_filenames = ["AlbrightHayes2003.DISC.txt"]
 testoutput_filename = "AlbrightHayes2003.Neighbors.txt"
 test_output = open(testoutput_filename, 'w')
 
-####### First read in the corpus
-# We'll make a list of all the lemmas
-lemmas = []
+# How many edits away a lemma can be to count as a neighbor (the usual definition is 1; Bailey & Hahn also counted neighbors at distance 2)
+max_distance = 1
 
-# Now go through the celex file and get all the lemmas
-for line in celex:
-	lemma_id, freq, orthog, disc, phon2 = line.split("\t")
-	lemmas.append(disc)
-celex.close()
+# To score the test words with Bailey & Hahn's Generalized Neighborhood Model as well, give a similarity table here, e.g. "GNM/similarity/BaileyHahnSimilarityValues.stb" (see NeighborTools.GNMScorer for its parameters)
+gnm_similarity_filename = None
+# How many test words to score at once, in separate processes (None for one per CPU)
+processes = None
 
-# In order to use regex.findall, the simplest thing is just to put the whole corpus into a long space-delimited string
-lemmas_string = "\t".join(lemmas)
+####### First read in the corpus: the lemma ids, the lemmas, and their frequencies
+lexicon = read_celex_lemmas(celex_filename)
+lemmas = lexicon.words
+
+# Index the lemmas by their deletion variants, so that the neighbors of each test word can be looked up rather than searched for in the whole corpus; for neighbors further away, put them in a trie instead (see NeighborTools.py)
+if max_distance == 1:
+	index = DeletionIndex(lemmas)
+else:
+	trie = LexiconTrie(lemmas, lexicon.frequencies)
+
+if gnm_similarity_filename is not None:
+	scorer = GNMScorer(lexicon, SegmentCosts(read_similarity_table(gnm_similarity_filename)))
 
 for test_filename in test_filenames:
 	test_file = open(test_filename, 'r')
 	# Aesthetic: differentiate which test forms came from which file, but label them according to the filename minus the .txt suffix
 	condition = test_filename.replace(".txt","")
 
-	for line in test_file:
-		line = line.strip()
-		# We assume that each line is a single word
-		# We build the regex for neighbors_regex
-		neighbors_regex = []
-		# Go from start to end of line. (In the last position, this will harmlessly add some redundant duplicates)
-		for c in range(0, len(line)+1):
-			# First neighbor is the insertion
-			neighbors_regex.append(line[:c] + '\S' + line[c:])
-			# Then substitution and deletion
-			neighbors_regex.append(line[:c] + '\S' + line[c+1:])
-			neighbors_regex.append(line[:c] + '\S?' + line[c+1:])
-
-		neighbors_regex_string = '[\b\s](' + '|'.join(neighbors_regex) + ')[\b\s]'
-		
-		neighbors = re.findall(neighbors_regex_string, lemmas_string)
-		test_output.write(line + "\t" + str(len(neighbors)) + "\t" + "; ".join(neighbors) + "\n")
+	# We assume that each line is a single word
+	test_words = [line.strip() for line in test_file]
+	test_file.close()
+	if gnm_similarity_filename is not None:
+		scores = gnm_scores(scorer, test_words, processes)
+
+	for t in range(len(test_words)):
+		line = test_words[t]
+		# Its neighbors are the lemmas that are at most max_distance insertions, substitutions or deletions away from it, in the order of the corpus
+		if max_distance == 1:
+			positions = index.neighbors(line)
+		else:
+			positions = [w for w, distance, frequency in trie.neighbors(line, max_distance)]
+		# Each lemma counts once
+		positions = lexicon.distinct_lemmas(positions)
+		count, summed_frequency, weighted_density = lexicon.density(positions)
+		neighbors = [lemmas[w] for w in positions]
+		test_output.write(line + "\t" + str(count) + "\t" + "; ".join(neighbors) + "\t" + str(summed_frequency) + "\t" + "%.4f" % weighted_density)
+		if gnm_similarity_filename is not None:
+			summed_similarity, adjusted_similarity, nearest = scores[t]
+			nearest_neighbors = ", ".join("%s (%s, %.5f)" % (lexicon.spellings[w], lexicon.frequencies[w], distance) for w, distance in nearest)
+			test_output.write("\t" + str(summed_similarity) + "\t" + str(adjusted_similarity) + "\t" + nearest_neighbors)
+		test_output.write("\n")
@@ -0,0 +1,283 @@
+# Tools for finding the neighbors of words in a lexicon: the words that are at most one edit (an insertion, a deletion or a substitution of a single segment) away from them.
+# Going through the whole lexicon for every word that we want the neighbors of is slow when there are many such words, so instead the lexicon is indexed once by its deletion variants (the "symmetric deletion" idea of the SymSpell spelling corrector): each word is listed under itself and under each of the strings made by deleting one of its segments.
+# Two words can only be one edit apart if they have one of these variants in common (a substitution deletes the same position from both, an insertion in one is a deletion from the other), so the neighbors of a word are among the words listed under its own variants, which is a handful of dictionary lookups. Having a variant in common isn't quite enough, though (ab and ba both have a), so each of these candidates is checked.
+import os
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+
+# A word, and the strings made by deleting one of its segments (each once)
+def deletion_variants(word):
+	variants = {word}
+	for c in range(len(word)):
+		variants.add(word[:c] + word[c+1:])
+	return variants
+
+# Whether two words are at most one edit apart
+def within_one_edit(word1, word2):
+	if len(word1) > len(word2):
+		word1, word2 = word2, word1
+	if len(word2) - len(word1) > 1:
+		return False
+	# Find the first place where they differ; after that, the rest has to be the same, once the differing segment is skipped (in the longer word, or in both, if they are the same length)
+	c = 0
+	while c < len(word1) and word1[c] == word2[c]:
+		c += 1
+	if len(word1) == len(word2):
+		return word1[c+1:] == word2[c+1:]
+	return word1[c:] == word2[c+1:]
+
+class DeletionIndex:
+	# The words are a list (in the order of the lexicon, which can have the same word more than once); the neighbors found are referred to by their positions in it
+	def __init__(self, words):
+		self.words = words
+		# For each variant, the positions of the words that have it, in order
+		self.variants = {}
+		for w in range(len(words)):
+			for variant in deletion_variants(words[w]):
+				if variant in self.variants:
+					self.variants[variant].append(w)
+				else:
+					self.variants[variant] = [w]
+
+	# The positions of the neighbors of a word (including the word itself, if it is in the lexicon), in the order of the lexicon
+	def neighbors(self, word):
+		candidates = set()
+		for variant in deletion_variants(word):
+			candidates.update(self.variants.get(variant, ()))
+		return [w for w in sorted(candidates) if within_one_edit(word, self.words[w])]
+
+# For neighbors further away than one edit (Bailey & Hahn counted words up to two edits away, for example), the deletion variants multiply too quickly, so instead the lexicon is put in a trie (a tree with a branch for each segment, so that words that begin the same way share the same path from the root) and searched with the rows of the edit distance table
+class LexiconTrie:
+	# The words are a list, as for DeletionIndex; the frequencies, if given, are a list of the same length, and are returned along with the neighbors
+	def __init__(self, words, frequencies=None):
+		self.words = words
+		self.frequencies = frequencies
+		# Each node is a pair: a dictionary of its children (keyed by segment), and the positions of the words that end there
+		self.root = ({}, [])
+		for w in range(len(words)):
+			node = self.root
+			for segment in words[w]:
+				if segment not in node[0]:
+					node[0][segment] = ({}, [])
+				node = node[0][segment]
+			node[1].append(w)
+
+	# The words at most max_distance edits away from a word (including the word itself, if it is in the lexicon), in the order of the lexicon, as (position, distance, frequency); the frequency is None if no frequencies were given
+	def neighbors(self, word, max_distance=1):
+		found = []
+		# Going down the trie, each node has a row of the edit distance table: the distances between the segments on the path to it and each beginning of the word. The row for a child is worked out from its parent's row, and a branch is given up on as soon as everything in the row is more than max_distance, since the distances can only go up from there
+		stack = [(self.root, list(range(len(word) + 1)))]
+		while stack:
+			(children, positions), row = stack.pop()
+			if row[-1] <= max_distance:
+				for w in positions:
+					found.append((w, row[-1]))
+			for segment, child in children.items():
+				child_row = [row[0] + 1]
+				for c in range(1, len(row)):
+					child_row.append(min(child_row[c-1] + 1, row[c] + 1, row[c-1] + (word[c-1] != segment)))
+				if min(child_row) <= max_distance:
+					stack.append((child, child_row))
+		found.sort()
+		if self.frequencies is None:
+			return [(w, distance, None) for w, distance in found]
+		return [(w, distance, self.frequencies[w]) for w, distance in found]
+
+# A lexicon, kept as columns (each in the order of the lexicon file): the lemma ids, the transcriptions (the words that the indexes above are made from), the frequencies, and the spellings (if there are any)
+class Lexicon:
+	def __init__(self, ids, words, frequencies, spellings=None):
+		self.ids = numpy.asarray(ids)
+		self.words = words
+		self.frequencies = numpy.asarray(frequencies, dtype=numpy.int64)
+		self.spellings = spellings
+		# The weights for the frequency-weighted density: the log of the frequency plus one (so that a lemma with a frequency of 0 gets a weight of 0, rather than minus infinity)
+		self.log_frequencies = numpy.log10(self.frequencies + 1)
+
+	# The positions of neighbors found in one of the indexes, keeping just one position for each lemma id (in case the lexicon lists a lemma more than once), in order
+	def distinct_lemmas(self, positions):
+		positions = numpy.asarray(positions, dtype=numpy.intp)
+		ids, first = numpy.unique(self.ids[positions], return_index=True)
+		return numpy.sort(positions[first])
+
+	# The density of a neighborhood (given as positions, as above): the number of distinct lemmas in it, their summed frequency, and their summed log frequency
+	def density(self, positions):
+		positions = self.distinct_lemmas(positions)
+		return len(positions), int(self.frequencies[positions].sum()), float(self.log_frequencies[positions].sum())
+
+# Read a lexicon in the format of CelexLemmasInTranscription-DISC.txt: a lemma on each line, with its id, frequency, spelling, DISC transcription, and (optionally, as in the GNM wordlists they aren't there) transcription with stress marks, separated by tabs
+def read_celex_lemmas(celex_filename):
+	ids = []
+	words = []
+	frequencies = []
+	spellings = []
+	celex = open(celex_filename, 'r')
+	for line in celex:
+		lemma_id, freq, orthog, disc = line.rstrip("\r\n").split("\t")[:4]
+		ids.append(int(lemma_id))
+		words.append(disc)
+		frequencies.append(int(freq))
+		spellings.append(orthog)
+	celex.close()
+	return Lexicon(ids, words, frequencies, spellings)
+
+
+####### The Generalized Neighborhood Model (Bailey & Hahn 2001), as in GNM/GNM.pl
+# In the GNM, every word of the lexicon counts towards the neighborhood of a test word, weighted by how similar it is: exp(-D * distance), where the distance is a weighted edit distance, in which substituting one segment for another costs 1 minus their similarity (from a similarity table, as written by SimilarityCalculator.py), and inserting or deleting a segment costs indel_cost. Each word's similarity is also weighted by its frequency: A*f^2 + B*f + C, where f is log10(frequency + freq_boost).
+
+# Read a similarity table (.stb file): a header row, and then a row for each pair of segments, with the similarity in the fifth column (the shared and unshared classes that SimilarityCalculator.py adds after that are ignored)
+# Returns a dictionary of the similarities, keyed by the pair of segments in sorted order
+def read_similarity_table(stb_filename):
+	stb_file = open(stb_filename, 'r')
+	header = stb_file.readline().rstrip("\r\n").lower().split("\t")
+	if len(header) < 5 or header[0] not in ("seg1", "class1") or header[1] not in ("seg2", "class2") or header[4] != "similarity":
+		stb_file.close()
+		raise ValueError("%s is not a similarity table (its first line is %s)" % (stb_filename, "\t".join(header)))
+	similarities = {}
+	for line in stb_file:
+		fields = line.rstrip("\r\n").split("\t")
+		similarities[tuple(sorted(fields[:2]))] = float(fields[4])
+	stb_file.close()
+	return similarities
+
+# The costs of substituting segments for each other: 1 minus their similarity, or 0 for a segment and itself, and 1 for a pair that isn't in the similarity table. So that the costs can be kept in a NumPy matrix, each segment is given a number (see encode)
+class SegmentCosts:
+	def __init__(self, similarities):
+		self.numbers = {}
+		self.matrix = numpy.zeros((0, 0))
+		for pair in similarities:
+			self.encode(pair)
+		for (seg1, seg2), similarity in similarities.items():
+			if seg1 != seg2:
+				self.matrix[self.numbers[seg1], self.numbers[seg2]] = 1 - similarity
+				self.matrix[self.numbers[seg2], self.numbers[seg1]] = 1 - similarity
+
+	# A word as a list of the numbers of its segments. A segment that hasn't been seen before gets a new number, and costs 1 to substitute for anything else
+	def encode(self, word):
+		codes = []
+		for segment in word:
+			if segment not in self.numbers:
+				self.numbers[segment] = len(self.numbers)
+				matrix = numpy.ones((len(self.numbers), len(self.numbers)))
+				matrix[:-1, :-1] = self.matrix
+				matrix[-1, -1] = 0
+				self.matrix = matrix
+			codes.append(self.numbers[segment])
+		return codes
+
+# The costs of the insertions and deletions at the edges of the edit distance table, for words of up to the given length. GNM.pl adds up indel_cost along the first row and column, and then takes each insertion or deletion to cost the difference between two neighboring cells there, which in floating point isn't always exactly indel_cost; the same is done here, so that words whose distances ought to be the same come out in the same order
+def indel_steps(indel_cost, length):
+	edge = [0]
+	for i in range(length):
+		edge.append(edge[-1] + indel_cost)
+	return edge, [edge[i] - edge[i-1] for i in range(1, length + 1)]
+
+# The weighted edit distance between two words (as lists of segment numbers), with the substitution costs in a matrix (as in SegmentCosts), and the insertions and deletions as from indel_steps
+def weighted_distance(codes1, codes2, cost_matrix, edge, steps):
+	previous = edge[:len(codes2) + 1]
+	for i in range(1, len(codes1) + 1):
+		costs = cost_matrix[codes1[i-1]].tolist()
+		step = steps[i-1]
+		current = [edge[i]]
+		for j in range(1, len(codes2) + 1):
+			current.append(min(previous[j] + step, current[j-1] + steps[j-1], previous[j-1] + costs[codes2[j-1]]))
+		previous = current
+	return previous[-1]
+
+# The words of a lexicon (as lists of segment numbers) grouped by length, each group as an array with a row of segment numbers for each word, so that a word can be compared with all of the words of a length at once (see group_distances). The groups are (length, the positions of the words in the lexicon, the array), shortest first
+def length_groups(codes):
+	by_length = {}
+	for w in range(len(codes)):
+		if len(codes[w]) in by_length:
+			by_length[len(codes[w])].append(w)
+		else:
+			by_length[len(codes[w])] = [w]
+	groups = []
+	for length in sorted(by_length):
+		positions = numpy.array(by_length[length], dtype=numpy.intp)
+		group = numpy.array([codes[w] for w in positions], dtype=numpy.intp).reshape(len(positions), length)
+		groups.append((length, positions, group))
+	return groups
+
+# The weighted edit distances (as in weighted_distance) from a word to each word in a group of words of the same length (an array, as from length_groups).
+# Rather than filling in a table for each pair of words, this fills in one row of the table at a time for the whole group: the substitutions and deletions for a row come straight from the row before, for all of the words at once, and then the insertions are added across the row, a column at a time
+def group_distances(codes, group, cost_matrix, edge, steps):
+	number, length = group.shape
+	previous = numpy.tile(numpy.array(edge[:length + 1]), (number, 1))
+	for i in range(1, len(codes) + 1):
+		substituted = previous[:, :-1] + cost_matrix[codes[i-1]][group]
+		deleted = previous[:, 1:] + steps[i-1]
+		best = numpy.minimum(deleted, substituted)
+		current = numpy.empty_like(previous)
+		current[:, 0] = edge[i]
+		for j in range(1, length + 1):
+			numpy.minimum(best[:, j-1], current[:, j-1] + steps[j-1], out=current[:, j])
+		previous = current
+	return previous[:, -1]
+
+class GNMScorer:
+	# The parameters are as in GNM.pl (and described in GNM/ReadMe.txt).
+	# Since substitutions never cost less than 0, two words whose lengths differ by k are at least k * indel_cost apart; a lexicon word that is far enough away by this measure that it can't add more than prune_below to the score isn't compared with the test word at all (so a score is never off by more than the size of the lexicon times prune_below; 0 compares everything)
+	def __init__(self, lexicon, costs, indel_cost=.7, D=5.75, A=0, B=0, C=1, freq_boost=2, prune_below=1e-12):
+		self.lexicon = lexicon
+		self.costs = costs
+		self.indel_cost = indel_cost
+		self.D = D
+		self.prune_below = prune_below
+		log_frequencies = numpy.log10(lexicon.frequencies + freq_boost)
+		self.weights = A * log_frequencies**2 + B * log_frequencies + C
+		self.max_weight = numpy.abs(self.weights).max()
+		self.codes = [costs.encode(word) for word in lexicon.words]
+		self.groups = length_groups(self.codes)
+		self.max_length = max(len(word_codes) for word_codes in self.codes)
+
+	# Whether the lexicon words of a length could add at least prune_below to the score of a word of another length
+	def within_reach(self, length, word_length):
+		return self.max_weight * math.exp(-self.D * self.indel_cost * abs(length - word_length)) >= self.prune_below
+
+	# The distances from a word to each word of the lexicon (inf for the ones that aren't compared), worked out for the words of each length at once
+	def distances(self, word):
+		codes = self.costs.encode(word)
+		cost_matrix = self.costs.matrix
+		edge, steps = indel_steps(self.indel_cost, max(len(codes), self.max_length))
+		distances = numpy.full(len(self.codes), numpy.inf)
+		for length, positions, group in self.groups:
+			if self.within_reach(length, len(codes)):
+				distances[positions] = group_distances(codes, group, cost_matrix, edge, steps)
+		return distances
+
+	# The GNM score of a word: its summed (weighted) similarity to the lexicon, the same divided by the size of the lexicon, and its nearest neighbors (the positions of the number_nearest most similar words, and their distances)
+	def score(self, word, number_nearest=5):
+		distances = self.distances(word)
+		similarities = self.weights * numpy.exp(-self.D * distances)
+		summed = float(similarities.sum())
+		# The most similar words come first; where there's a tie, the one that comes first in the lexicon does
+		nearest = numpy.argsort(-similarities, kind='stable')[:number_nearest].tolist()
+		return summed, summed / len(self.codes), [(w, float(distances[w])) for w in nearest]
+
+# The scorer that the processes started by gnm_scores() use (each one gets it once, when it starts)
+pool_scorer = None
+
+def set_pool_scorer(scorer):
+	global pool_scorer
+	pool_scorer = scorer
+
+def pool_score(word):
+	return pool_scorer.score(word)
+
+# The GNM scores (see GNMScorer.score) of a list of words, worked out in a pool of processes (started by forking where possible), or all in this process if processes is 1
+def gnm_scores(scorer, words, processes=None):
+	# Number any new segments in the test words first, so that all of the processes number them the same way
+	for word in words:
+		scorer.costs.encode(word)
+	if processes == 1:
+		return [scorer.score(word) for word in words]
+	if "fork" in multiprocessing.get_all_start_methods():
+		context = multiprocessing.get_context("fork")
+	else:
+		context = multiprocessing.get_context()
+	executor = ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=set_pool_scorer, initargs=(scorer,))
+	scores = list(executor.map(pool_score, words, chunksize=max(1, len(words) // (8 * (processes or os.cpu_count())))))
+	executor.shutdown()
+	return scores
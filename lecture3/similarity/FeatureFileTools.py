@@ -1,4 +1,6 @@
 import re
+import numpy
+
 def cleanup_line (line):
 	line = line.strip()
 	#Kie's version of these files has fields in quotes and with commas, "X,"
@@ -12,3 +14,99 @@ def cleanup_line (line):
 	line = re.sub(r'\s+$', '', line)
 	return line
 
+
+# The cleanup above, for a single (tab-separated) field of a line, without the stripping of white space
+def cleanup_field(field):
+	field = re.sub(r'\"([^\"]*),\"', r'\1', field)
+	field = re.sub(r',(\s|$)', r'\1', field)
+	field = re.sub(r'(\"?NoMoreFeatures\"?|NoMoreSegments|EndOfLine)', '', field)
+	return field
+
+# Split a line of a feature file into its fields, cleaned up as by cleanup_line(). A feature file has the same few fields ("+,", 0, and so on) over and over, so rather than going over every line with the regular expressions, each different field is cleaned up just once, and remembered in field_cache (a dictionary to share between the lines of a file)
+def tokenize_line(line, field_cache):
+	fields = line.strip().split('\t')
+	for k in range(len(fields)):
+		cleaned = field_cache.get(fields[k])
+		if cleaned is None:
+			cleaned = cleanup_field(fields[k])
+			field_cache[fields[k]] = cleaned
+		fields[k] = cleaned
+	# The cleanup can leave white space (or nothing) at the end of the line, which is stripped off, along with any fields that are left empty
+	while len(fields) > 1 and fields[-1].strip() == '':
+		del fields[-1]
+	fields[-1] = fields[-1].rstrip()
+	return fields
+
+# Read the lines of a feature file: the first line has the feature names, and the rest each have a segment and its feature values.
+# Returns the feature names, the list of segments (in the order of the file), and a dictionary of the feature values of each segment. If verbose, it prints what it finds along the way
+def parse_feature_lines(feature_lines, verbose=False):
+	field_cache = {}
+	# The first line contains the feature names
+	firstline = '\t'.join(tokenize_line(feature_lines[0], field_cache))
+	# also for some reason these often begin without tabs, but just in case
+	# they do have tabs
+	firstline = firstline.lstrip()
+	features = firstline.split('\t')
+	number_of_features = len(features)
+	if verbose:
+		print("There are %s features in this file" % number_of_features)
+		print(firstline)
+
+	# Now the rest of the file, which contains the feature values
+	feature_matrix = {}
+	segments = []
+
+	for line in feature_lines[1:]:
+		seg, *values = tokenize_line(line, field_cache)
+
+		# If the segment is a dollar sign, it needs to be protected
+		if seg == '$' and verbose:
+			print( "Segment $ may cause trouble.")
+		# Skip lines with a blank segment
+		if seg == '':
+			continue
+
+		# Also ignore value-less lines, process only those lines with feature values
+		if len(values) > 0:
+			# If the first value is nothing but digits, or is completely empty, it's a code (assuming no scalar features!! but this script can't handle scalar features, anyway)
+			if values[0].isdecimal() or values[0] == "":
+				del values[0]
+
+			if verbose:
+				print('Segment %s: %s' % (seg, ','.join(values)))
+
+			# Store the segments in a list of segments, for convenience
+			segments.append(seg)
+
+			# And remember the feature values
+			feature_matrix[seg] = values
+
+			# A consistency check
+			if len(values) != number_of_features and verbose:
+				print('Warning! segments %s has an incorrect number of features. \\(%s instead of %s\\)' % (seg, len(values), number_of_features))
+
+	return features, segments, feature_matrix
+
+def read_feature_file(feature_filename, verbose=False):
+	feature_file = open(feature_filename, 'r')
+	feature_lines = feature_file.readlines()
+	feature_file.close()
+	return parse_feature_lines(feature_lines, verbose)
+
+# The numbers that feature values stand for in a feature array: anything other than + and - (0, or an illegal value) is unspecified
+feature_value_numbers = {'+': 1, '-': -1}
+
+# The feature values of a feature file as a matrix of numbers, for scripts that want to do arithmetic with them: a NumPy int8 array with a row for each segment (in the order of the list of segments) and a column for each feature, holding 1 for +, -1 for - and 0 for anything else. Missing values at the ends of short lines are 0, too.
+# Returns the feature names, the list of segments, and the array
+def feature_array(features, segments, feature_matrix):
+	array = numpy.zeros((len(segments), len(features)), dtype=numpy.int8)
+	for s in range(len(segments)):
+		values = feature_matrix[segments[s]]
+		if len(values) > len(features):
+			raise ValueError("segment %s has %s feature values, but there are only %s features" % (segments[s], len(values), len(features)))
+		array[s, :len(values)] = [feature_value_numbers.get(value, 0) for value in values]
+	return features, segments, array
+
+# Read a feature file straight into a feature array (see feature_array above)
+def read_feature_array(feature_filename, verbose=False):
+	return feature_array(*read_feature_file(feature_filename, verbose))
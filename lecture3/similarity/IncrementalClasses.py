@@ -0,0 +1,313 @@
+# Updating the natural classes of a feature system after a small change to the feature file, instead of finding all of the classes again from scratch.
+# When a feature system is being worked on, usually just one segment's values change, or a feature is added. The natural classes are the sets of segments picked out by combinations of feature values, so they can be updated one change at a time:
+#	removing a segment takes it out of every class (classes that become the same are merged, and classes that become empty disappear)
+#	adding a feature value (half of a column: the segments that are +F, or the ones that are -F) adds the intersection of its segments with each class
+#	removing a feature value keeps just the classes that can still be described without it
+#	adding a segment adds it to the classes whose descriptions fit it; a class can also split in two, if it has one description that fits the new segment and another that doesn't
+# A changed feature column is treated as removing its old values and adding the new ones. The classes found this way are exactly the ones that NaturalClassSet finds. The classes that change get new descriptions (see ClassUpdate.describe), though, which may be worded differently from the ones a full recalculation would choose.
+# Usage: python IncrementalClasses.py old_feature_file new_feature_file [include|exclude]
+#	updates the classes of the old feature file to the new one, writes the new similarity matrix to a .matrix.sim file (as NaturalClasses.py does, so that SimilarityCalculator.py's .sim file isn't overwritten), and lists the pairs of segments whose similarity changed
+import re
+import sys
+import copy
+from collections import Counter
+import numpy
+
+from FeatureFileTools import read_feature_file
+from NaturalClasses import NaturalClassSet, load_class_set, write_similarity_matrix, matrix_suffix
+
+# A mask with bit b taken out (so the bits above it move down one), or with a new, empty, bit b put in (so the bits from b up move up one)
+def remove_bit(mask, b):
+	return (mask & ((1 << b) - 1)) | ((mask >> (b + 1)) << b)
+
+def insert_bit(mask, b):
+	return (mask & ((1 << b) - 1)) | ((mask >> b) << (b + 1))
+
+# The feature values, named '-F' and '+F' for each feature F, with the mask of the segments (of the ones given, with their bits) that have that value
+def feature_values(features, feature_matrix, segment_bits):
+	values = {}
+	for f in range(len(features)):
+		values['-' + features[f]] = 0
+		values['+' + features[f]] = 0
+	for seg in segment_bits:
+		seg_values = feature_matrix[seg]
+		for f in range(min(len(features), len(seg_values))):
+			if seg_values[f] == '-' or seg_values[f] == '+':
+				values[seg_values[f] + features[f]] |= segment_bits[seg]
+	return values
+
+# The classes in the middle of being updated: masks with their descriptions, leaving out the empty class and the superclass (which are put back at the end), and the feature values as they stand
+class ClassUpdate:
+	def __init__(self, class_set, values, members):
+		self.specification = class_set.specification
+		self.descs = {}
+		self.desc_lengths = {}
+		for c in class_set.descs:
+			# The superclass added by the 'include' option is the only class with an empty description
+			if c != 0 and class_set.desc_lengths[c] > 0:
+				self.descs[c] = class_set.descs[c]
+				self.desc_lengths[c] = class_set.desc_lengths[c]
+		self.values = values
+		# The segments that are currently in the feature system
+		self.members = members
+		# How many classes were intersected with something (to compare with NaturalClassSet.number_considered)
+		self.number_considered = 0
+
+	# Add a class with a description (a list of feature values), keeping the shorter description (for underspecification) or the longer one (for full specification) if the class is already known
+	def add(self, mask, desc):
+		length = len(desc)
+		if mask in self.descs:
+			if self.specification == 'minimal' and self.desc_lengths[mask] <= length:
+				return
+			if self.specification != 'minimal' and self.desc_lengths[mask] >= length:
+				return
+		self.descs[mask] = ', '.join(desc)
+		self.desc_lengths[mask] = length
+
+	def remove(self, mask):
+		del self.descs[mask]
+		del self.desc_lengths[mask]
+
+	# All of the feature values that every segment in a class has
+	def intent(self, mask):
+		return [name for name, value_mask in self.values.items() if mask & ~value_mask == 0]
+
+	# The segments that have all of the given feature values
+	def extent(self, names):
+		mask = self.members
+		for name in names:
+			mask &= self.values[name]
+		return mask
+
+	# A description of a class, from feature values that between them pick out exactly that class. Fully specified descriptions just use all of them; for underspecification, values are picked one at a time, each time the one that leaves the fewest segments, until only the class is left (this is short, but not always the shortest possible)
+	def describe(self, mask, candidates):
+		if self.specification != 'minimal':
+			return list(candidates)
+		desc = []
+		extent = self.members
+		while extent != mask:
+			best = min(candidates, key=lambda name: bin(extent & self.values[name]).count('1'))
+			desc.append(best)
+			extent &= self.values[best]
+		return desc
+
+	def remove_segment(self, b):
+		descs = self.descs
+		self.descs = {}
+		self.desc_lengths = {}
+		for c in descs:
+			new_class = remove_bit(c, b)
+			if new_class != 0:
+				self.add(new_class, descs[c].split(', '))
+		self.members = remove_bit(self.members, b)
+		for name in self.values:
+			self.values[name] = remove_bit(self.values[name], b)
+
+	# Make room for a segment, at bit b, without putting it in anything yet
+	def insert_segment(self, b):
+		self.descs = {insert_bit(c, b): desc for c, desc in self.descs.items()}
+		self.desc_lengths = {insert_bit(c, b): length for c, length in self.desc_lengths.items()}
+		self.members = insert_bit(self.members, b)
+		for name in self.values:
+			self.values[name] = insert_bit(self.values[name], b)
+
+	def remove_values(self, names):
+		removed = set(names)
+		for name in removed:
+			del self.values[name]
+		for c in list(self.descs):
+			if removed.isdisjoint(self.descs[c].split(', ')):
+				continue
+			# The class needs a new description, if it can still be described at all
+			self.remove(c)
+			candidates = self.intent(c)
+			self.number_considered += 1
+			if len(candidates) > 0 and self.extent(candidates) == c:
+				self.add(c, self.describe(c, candidates))
+
+	def add_value(self, name, mask):
+		for c in list(self.descs):
+			self.number_considered += 1
+			new_class = c & mask
+			if new_class != 0:
+				self.add(new_class, self.descs[c].split(', ') + [name])
+		if mask != 0:
+			self.add(mask, [name])
+		self.values[name] = mask
+
+	# Add the segment at bit b (which must already have been made room for), which has the feature values given
+	def add_segment(self, b, names):
+		bit = 1 << b
+		names = [name for name in names if name in self.values]
+		has_value = set(names)
+		new_classes = []
+		for c in list(self.descs):
+			self.number_considered += 1
+			intent = self.intent(c)
+			desc = self.descs[c].split(', ')
+			shared = [name for name in intent if name in has_value]
+			fits = has_value.issuperset(desc)
+			# The class plus the new segment is a class if the values that they have in common pick out just this class (among the old segments)
+			if len(shared) > 0 and self.extent(shared) == c:
+				if fits:
+					new_classes.append((c | bit, desc))
+				else:
+					new_classes.append((c | bit, self.describe(c, shared)))
+			# The class without the new segment stays a class if it has a value that the new segment doesn't
+			if len(shared) == len(intent):
+				self.remove(c)
+			elif fits:
+				# but if its description fits the new segment, that description now picks out the class plus the new segment, so it needs another one
+				self.remove(c)
+				if self.specification == 'minimal':
+					self.add(c, desc + [name for name in intent if name not in has_value][:1])
+				else:
+					self.add(c, intent)
+		# The new segment may also be a class all by itself, if no old segment has all of its values
+		if len(names) > 0 and self.extent(names) == 0:
+			new_classes.append((bit, self.describe(0, names)))
+
+		self.members |= bit
+		for name in names:
+			self.values[name] |= bit
+		for new_class, desc in new_classes:
+			self.add(new_class, desc)
+
+
+# Update a NaturalClassSet to a new version of its feature file (features, segments and feature matrix as from read_feature_file).
+# Returns the new NaturalClassSet, and a mask (over the new segments) of the segments whose similarities to other segments may have changed
+def update_class_set(class_set, features, segments, feature_matrix, verbose=False):
+	old_segments = class_set.bit_segments
+	new_segments = list(feature_matrix)
+	everything = (1 << len(new_segments)) - 1
+	# The update works on segments that are added and removed, but if the segments that are in both versions are in a different order, or there are features with the same name, just start again
+	kept = [seg for seg in old_segments if seg in feature_matrix]
+	if len(kept) == 0 or kept != [seg for seg in new_segments if seg in class_set.segment_bits] or len(set(features)) != len(features) or len(set(class_set.features)) != len(class_set.features):
+		return NaturalClassSet(features, segments, feature_matrix, class_set.specification, class_set.superclass, verbose, class_set.algorithm), everything
+
+	removed_bits = [b for b in range(len(old_segments)) if old_segments[b] not in feature_matrix]
+	added_bits = [b for b in range(len(new_segments)) if new_segments[b] not in class_set.segment_bits]
+
+	old_values = feature_values(class_set.features, class_set.feature_matrix, class_set.segment_bits)
+	update = ClassUpdate(class_set, old_values, (1 << len(old_segments)) - 1)
+
+	# First the segments that are gone, and room for the new ones; then the changes to the features, for the segments in both versions; then the new segments
+	for b in reversed(removed_bits):
+		update.remove_segment(b)
+	for b in added_bits:
+		update.insert_segment(b)
+
+	kept_bits = {new_segments[b]: 1 << b for b in range(len(new_segments)) if new_segments[b] in class_set.segment_bits}
+	new_values = feature_values(features, feature_matrix, kept_bits)
+	changed = [name for name in update.values if new_values.get(name) != update.values[name]]
+	update.remove_values(changed)
+	for name in new_values:
+		if name not in update.values:
+			update.add_value(name, new_values[name])
+
+	for b in added_bits:
+		seg_values = feature_matrix[new_segments[b]]
+		names = [seg_values[f] + features[f] for f in range(min(len(features), len(seg_values))) if seg_values[f] == '-' or seg_values[f] == '+']
+		update.add_segment(b, names)
+
+	# Now make the new class set, with the classes found, plus the unitary classes (including an empty one, if a feature value is had by nothing), and the superclass
+	new_set = copy.copy(class_set)
+	new_set.features = features
+	new_set.segments = segments
+	new_set.feature_matrix = feature_matrix
+	new_set.segment_bits = {new_segments[b]: 1 << b for b in range(len(new_segments))}
+	new_set.bit_segments = new_segments
+	new_set.find_unitary_classes(verbose)
+	unitary = []
+	for f in range(len(features)):
+		for val in (0,1):
+			mask = new_set.unitary_classes[f][val]
+			name = ('+' if val == 1 else '-') + features[f]
+			if mask not in update.descs or (class_set.specification == 'minimal' and update.desc_lengths[mask] > 1):
+				update.descs[mask] = name
+				update.desc_lengths[mask] = 1
+			if mask not in unitary:
+				unitary.append(mask)
+	new_set.number_of_unitary_classes = len(unitary)
+	new_set.number_considered = update.number_considered
+	new_set.descs = update.descs
+	new_set.desc_lengths = update.desc_lengths
+	new_set.incidence = None
+	# If the segments are the same, the classes that were already there keep their names (apart from the superclass, which is named differently)
+	known_names = {}
+	if len(removed_bits) == 0 and len(added_bits) == 0:
+		known_names = {c: name for c, name in class_set.names.items() if class_set.desc_lengths[c] > 0}
+	new_set.finish_classes(list(update.descs), known_names)
+
+	# The segments whose classes changed: compare the classes, leaving out the new segments, and putting the old ones where they are in the new version. If they are all the same, then the similarities between the old segments are too
+	def moved(mask):
+		for b in reversed(removed_bits):
+			mask = remove_bit(mask, b)
+		for b in added_bits:
+			mask = insert_bit(mask, b)
+		return mask
+	added = 0
+	for b in added_bits:
+		added |= 1 << b
+	old_classes = Counter(moved(c) for c in class_set.classes)
+	new_classes = Counter(c & ~added for c in new_set.classes)
+	affected = added
+	for c in (old_classes - new_classes) + (new_classes - old_classes):
+		affected |= c
+	return new_set, affected
+
+# Update a similarity matrix (from NaturalClassSet.similarity_matrix) for the changes found by update_class_set: only the rows and columns of the affected segments are calculated again.
+# Returns the new matrix, and a list of the pairs whose similarity changed (or which are new), as (seg1, seg2, old similarity or None, new similarity)
+def update_similarity_matrix(old_class_set, old_matrix, new_class_set, affected):
+	new_segments = new_class_set.bit_segments
+	old_index = {old_class_set.bit_segments[k]: k for k in range(len(old_class_set.bit_segments))}
+	matrix = numpy.full((len(new_segments), len(new_segments)), numpy.nan)
+	kept = [k for k in range(len(new_segments)) if new_segments[k] in old_index]
+	old_kept = [old_index[new_segments[k]] for k in kept]
+	matrix[numpy.ix_(kept, kept)] = old_matrix[numpy.ix_(old_kept, old_kept)]
+	previous = matrix.copy()
+
+	rows = [b for b in range(len(new_segments)) if affected >> b & 1]
+	if len(rows) == 0:
+		return matrix, []
+	incidence = new_class_set.incidence_matrix().astype(numpy.float64)
+	counts = incidence.sum(axis=1)
+	shared = incidence[rows] @ incidence.T
+	total = counts[rows][:, None] + counts[None, :] - shared
+	with numpy.errstate(divide='ignore', invalid='ignore'):
+		values = shared / total
+	matrix[rows, :] = values
+	matrix[:, rows] = values.T
+
+	# The pairs (each once, as in the upper triangle) in an affected row or column whose similarity is different; nan (for segments in no classes) is never equal to anything, even itself, so pairs that were and are nan aren't counted
+	new = numpy.zeros(len(new_segments), dtype=bool)
+	new[[b for b in range(len(new_segments)) if new_segments[b] not in old_index]] = True
+	differ = ~((previous == matrix) | (numpy.isnan(previous) & numpy.isnan(matrix))) | new[:, None] | new[None, :]
+	changes = []
+	for s1, s2 in zip(*numpy.nonzero(numpy.triu(differ))):
+		old_similarity = None
+		if not new[s1] and not new[s2]:
+			old_similarity = float(previous[s1, s2])
+		changes.append((new_segments[s1], new_segments[s2], old_similarity, float(matrix[s1, s2])))
+	return matrix, changes
+
+
+if __name__ == "__main__":
+	if len(sys.argv) < 3:
+		print("Usage: python IncrementalClasses.py old_feature_file new_feature_file [include|exclude]\n\twrites the new similarity matrix to new_feature_file (without its extension) + %s" % matrix_suffix)
+		sys.exit()
+	old_feature_filename = sys.argv[1]
+	feature_filename = sys.argv[2]
+	superclass = 'include'
+	if len(sys.argv) > 3:
+		superclass = sys.argv[3]
+	old_class_set = load_class_set(old_feature_filename, superclass=superclass)
+	features, segments, feature_matrix = read_feature_file(feature_filename)
+	# (The updated classes aren't put in the class cache, since their descriptions and order can differ from the ones a full calculation would find)
+	class_set, affected = update_class_set(old_class_set, features, segments, feature_matrix)
+	matrix, changes = update_similarity_matrix(old_class_set, old_class_set.similarity_matrix(), class_set, affected)
+	sim_matrix_filename = re.sub(r'\.[^\.]*$', '', feature_filename) + matrix_suffix
+	write_similarity_matrix(sim_matrix_filename, class_set.bit_segments, matrix)
+	for seg1, seg2, old_similarity, new_similarity in changes:
+		print("%s\t%s\t%s\t%s" % (seg1, seg2, old_similarity, new_similarity))
+	print("%s classes (%s considered); %s pairs changed; similarity matrix written to %s" % (len(class_set.classes), class_set.number_considered, len(changes), sim_matrix_filename))
@@ -0,0 +1,391 @@
+# The natural classes of a feature system, and the Frisch/Broe/Pierrehumbert similarities between segments that they give, for use from other scripts (SimilarityCalculator.py uses this to find the classes).
+# A natural class is represented as an integer with a bit set for each segment in it (a bitmask): bit k stands for the k-th segment in the feature file. Then the intersection of two classes is just a single &, and a class can be looked up in a dictionary by its mask.
+# The similarity of two segments is the number of classes that contain both of them, divided by the number of classes that contain either of them. With the classes as the columns of a segments x classes matrix of 0s and 1s (an "incidence matrix"), the numbers of shared classes for all pairs of segments are a single matrix product, which makes this fast even for large inventories.
+# Usage: python NaturalClasses.py feature_file [include|exclude]
+#	writes the similarity matrix for the feature file to a .matrix.sim file (without the .stb table or the .cls and .log files that SimilarityCalculator.py writes, and without overwriting its .sim file; see matrix_suffix below)
+# Finding the classes takes a while for big feature systems, so the classes found for a feature matrix (and their incidence matrix) are also saved in a cache directory, and loaded from there the next time the same feature matrix is used with the same options (see cached_class_set below)
+import os
+import re
+import sys
+import pickle
+import hashlib
+import tempfile
+import functools
+import numpy
+
+from FeatureFileTools import read_feature_file
+
+class NaturalClassSet:
+	# The specification can be 'minimal' (contrastive underspecification) or 'maximal' (fully specified); this only affects the descriptions of the classes, not the classes themselves.
+	# The superclass can be 'include' (always add the class of all segments) or 'exclude' (only include it if it is a genuine class)
+	# The algorithm can be 'pairwise' (as in the perl version of this script) or 'closure' (see combine_closure); both find the same classes, but their descriptions may be different
+	# If verbose, warnings about illegal feature values are printed
+	def __init__(self, features, segments, feature_matrix, specification='minimal', superclass='include', verbose=False, algorithm='pairwise'):
+		self.features = features
+		self.segments = segments
+		self.feature_matrix = feature_matrix
+		self.specification = specification
+		self.superclass = superclass
+		self.algorithm = algorithm
+
+		# Each segment gets a bit, in the order in which the segments appear in the feature file
+		self.segment_bits = {}
+		self.bit_segments = []
+		for seg in feature_matrix:
+			self.segment_bits[seg] = 1 << len(self.bit_segments)
+			self.bit_segments.append(seg)
+
+		self.find_unitary_classes(verbose)
+		self.find_classes()
+		# The incidence matrix, once it has been made
+		self.incidence = None
+
+	# The segments in a class, in the order of the feature file
+	def class_segments(self, mask):
+		found = []
+		while mask:
+			lowest = mask & -mask
+			found.append(self.bit_segments[lowest.bit_length() - 1])
+			mask ^= lowest
+		return found
+
+	# The string representation of a class, for output files: its segments, sorted, and separated by spaces (so that we can have segments with transcriptions longer than one character)
+	def class_name(self, mask):
+		return ' '.join(sorted(self.class_segments(mask)))
+
+	def find_unitary_classes(self, verbose):
+		# The unitary classes: a list with the same length as the number of features.  Each entry is itself a list, of length two: the mask of the '-' segments and the mask of the '+' segments
+		self.unitary_classes = [ [0,0] for i in range(len(self.features))]
+		for seg, values in self.feature_matrix.items():
+			for f in range(0,len(values)):
+				if values[f] == '-':
+					self.unitary_classes[f][0] |= self.segment_bits[seg]
+				elif values[f] == '+':
+					self.unitary_classes[f][1] |= self.segment_bits[seg]
+				elif values[f] != '0' and verbose:
+					print( 'Warning! Ignoring illegal feature value, number %s, for segment %s: %s'% (f,seg,values[f]))
+
+	def find_classes(self):
+		# The classes, in the order they were found, and a dictionary for how to describe each class, and how many features it takes (keyed by the class's mask)
+		classes = []
+		self.descs = {}
+		self.desc_lengths = {}
+		features = self.features
+		descs = self.descs
+		desc_lengths = self.desc_lengths
+		for f in range(len(self.unitary_classes)):
+			# We need to consider both positive and negative values
+			for val in (0,1):
+				myclass = self.unitary_classes[f][val]
+				# If we've already discovered this class, it will have a description. If the class doesn't have a description, we need to add it
+				if myclass not in descs:
+					classes.append(myclass)
+					if val == 1:
+						descs[myclass] = '+' + features[f]
+					else:
+						descs[myclass] = '-' + features[f]
+					# The unitary classes have length 1
+					desc_lengths[myclass] = 1
+		self.number_of_unitary_classes = len(classes)
+
+		if self.algorithm == 'closure':
+			self.combine_closure(classes)
+		else:
+			self.combine_pairwise(classes)
+		self.finish_classes(classes)
+
+	# Combine the unitary classes with the classes we already know, to create classes with more complex descriptions (the classes are added to the list given)
+	def combine_pairwise(self, classes):
+		descs = self.descs
+		desc_lengths = self.desc_lengths
+		# The classes found in the course of this are only combined with the unitary classes that come before them in the list (as in the perl version of this script)
+		# Also keep track of how many pairs of classes were intersected
+		self.number_considered = 0
+		for c1 in range(self.number_of_unitary_classes):
+			number_of_classes = len(classes)
+			for c2 in range(c1+1,number_of_classes):
+				self.number_considered += 1
+				candidate_class = classes[c1] & classes[c2]
+				if candidate_class == 0:
+					continue
+				# The two classes being merged may redundantly have a feature specification in common, so the duplicates are weeded out
+				candidate_desc_set = set((descs[classes[c1]] + ", " + descs[classes[c2]]).split(', '))
+				candidate_desc = ', '.join(candidate_desc_set)
+				candidate_length = len(candidate_desc_set)
+
+				if candidate_class not in descs:
+					classes.append(candidate_class)
+					descs[candidate_class] = candidate_desc
+					desc_lengths[candidate_class] = candidate_length
+				# If we've already seen this class, we might want to replace its description with a shorter one (for underspecification) or a longer one (for full specification)
+				elif self.specification == 'minimal':
+					if desc_lengths[candidate_class] > candidate_length:
+						descs[candidate_class] = candidate_desc
+						desc_lengths[candidate_class] = candidate_length
+				else:
+					if desc_lengths[candidate_class] < candidate_length:
+						descs[candidate_class] = candidate_desc
+						desc_lengths[candidate_class] = candidate_length
+
+	# The same classes, found by closing the unitary classes under intersection with the FCbO ("fast close-by-one") algorithm from formal concept analysis (Outrata & Vychodil 2012). Each class is found exactly once, by adding unitary classes in a fixed order, so far fewer pairs of classes need to be intersected than above.
+	# The distinct non-empty unitary classes serve as "attributes", numbered in the order they were found. A class is identified with the set of attributes that all of its segments have (its "intent", a bitmask over the attributes); intersecting a class with attribute a gives a new class only if that doesn't bring in any attribute before a that the class didn't already have (otherwise the same class is found by adding that earlier attribute first).
+	# The descriptions are the unitary classes that the class was found from, leaving out any that turn out to be redundant (for underspecification; these are not always the shortest possible, but nearly), or the whole intent (for full specification)
+	def combine_closure(self, classes):
+		descs = self.descs
+		desc_lengths = self.desc_lengths
+		attributes = [c for c in classes if c != 0]
+		attribute_names = [descs[c] for c in attributes]
+		all_attributes = (1 << len(attributes)) - 1
+		everything = (1 << len(self.bit_segments)) - 1
+
+		# The attributes of each segment
+		segment_attributes = [0] * len(self.bit_segments)
+		for a in range(len(attributes)):
+			mask = attributes[a]
+			while mask:
+				lowest = mask & -mask
+				segment_attributes[lowest.bit_length() - 1] |= 1 << a
+				mask ^= lowest
+
+		# The intent of a (non-empty) class, given some attributes that it is already known to have. Only the attributes of any one of its segments can be attributes of the whole class, so just those need checking
+		def intent(mask, known=0):
+			found = known
+			candidates = segment_attributes[(mask & -mask).bit_length() - 1] & ~known
+			while candidates:
+				lowest = candidates & -candidates
+				if mask & ~attributes[lowest.bit_length() - 1] == 0:
+					found |= lowest
+				candidates ^= lowest
+			return found
+
+		# Keep track of how many pairs of classes were intersected
+		self.number_considered = 0
+		# Each entry on the stack is a class, its intent, the first attribute to try adding to it, the unitary classes it was found from, and for each attribute, the intent of a class that turned out not to be new when that attribute was added to a class on the way to this one (so adding it here would not give a new class either, unless this class has all of that intent's earlier attributes)
+		stack = [(everything, intent(everything), 0, [], [0] * len(attributes))]
+		while stack:
+			mask, mask_intent, first, path, not_new = stack.pop()
+			new_not_new = list(not_new)
+			children = []
+			for a in range(first, len(attributes)):
+				if mask_intent >> a & 1:
+					continue
+				earlier = (1 << a) - 1
+				if not_new[a] & earlier & ~mask_intent:
+					continue
+				self.number_considered += 1
+				candidate_class = mask & attributes[a]
+				candidate_intent = intent(candidate_class, mask_intent | 1 << a) if candidate_class != 0 else all_attributes
+				if candidate_class != 0 and candidate_intent & earlier == mask_intent & earlier:
+					children.append((candidate_class, candidate_intent, a + 1, path + [a]))
+				else:
+					new_not_new[a] = candidate_intent
+
+			for candidate_class, candidate_intent, next_first, candidate_path in children:
+				if self.specification == 'minimal':
+					# Leave out the unitary classes that aren't needed to pick out the class, trying each in turn: one can go if the ones kept so far, together with the ones still to be tried, still pick out the class
+					later = [everything] * (len(candidate_path) + 1)
+					for k in range(len(candidate_path) - 1, -1, -1):
+						later[k] = later[k + 1] & attributes[candidate_path[k]]
+					desc = []
+					kept_class = everything
+					for k in range(len(candidate_path)):
+						if (len(desc) > 0 or k + 1 < len(candidate_path)) and kept_class & later[k + 1] == candidate_class:
+							continue
+						desc.append(candidate_path[k])
+						kept_class &= attributes[candidate_path[k]]
+				else:
+					desc = [a for a in range(len(attributes)) if candidate_intent >> a & 1]
+				# The unitary classes are already known (with their one-feature descriptions, which are kept for underspecification)
+				if candidate_class not in descs:
+					classes.append(candidate_class)
+				elif self.specification == 'minimal' or desc_lengths[candidate_class] >= len(desc):
+					continue
+				descs[candidate_class] = ', '.join(attribute_names[a] for a in desc)
+				desc_lengths[candidate_class] = len(desc)
+			for candidate_class, candidate_intent, next_first, candidate_path in reversed(children):
+				stack.append((candidate_class, candidate_intent, next_first, candidate_path, new_not_new))
+
+	# Given the classes found (in the order they were found, with their descriptions in self.descs and self.desc_lengths), name them, add the superclass if desired, and sort them
+	# Names already worked out for some of the classes (with the same segments) can be given, to save making them again
+	def finish_classes(self, classes, known_names=None):
+		if known_names is None:
+			known_names = {}
+		descs = self.descs
+		desc_lengths = self.desc_lengths
+		# The string representation of each class
+		self.names = {c: known_names[c] if c in known_names else self.class_name(c) for c in descs}
+
+		# Now, if desired, add the "null description" class, which contains all of the segments
+		if self.superclass == 'include':
+			totalclass = (1 << len(self.bit_segments)) - 1
+			if totalclass not in descs:
+				classes.append(totalclass)
+				descs[totalclass] = ''
+				desc_lengths[totalclass] = 0
+				# The superclass is named by listing all of the segments, in which a segment that appears on more than one line of the feature file appears more than once
+				self.names[totalclass] = ' '.join(sorted(self.segments))
+
+		# Sort the classes by the length of their descriptions
+		self.classes = sorted(classes, key=lambda x: desc_lengths[x])
+
+	# A segments x classes matrix, with a 1 where the segment (in the order of the feature file, each segment once) is in the class (in the sorted order of the classes)
+	def incidence_matrix(self):
+		if self.incidence is not None:
+			return self.incidence
+		number_of_segments = len(self.bit_segments)
+		number_of_bytes = (number_of_segments + 7) // 8
+		# Unpack all of the masks at once: each one as bytes (lowest bits first), and then the bytes as bits
+		packed = numpy.frombuffer(b''.join(mask.to_bytes(number_of_bytes, 'little') for mask in self.classes), dtype=numpy.uint8)
+		bits = numpy.unpackbits(packed.reshape(len(self.classes), number_of_bytes), axis=1, bitorder='little')
+		matrix = numpy.ascontiguousarray(bits[:, :number_of_segments].T, dtype=bool)
+		self.incidence = matrix
+		return matrix
+
+	# The similarity of each pair of segments (in the order of the feature file, each segment once): the number of classes containing both, divided by the number of classes containing either. Pairs of segments that are in no classes at all get nan
+	def similarity_matrix(self):
+		# (In floating point, so that the matrix product is done by the fast linear algebra routines; the counts are whole numbers, so they are exact)
+		incidence = self.incidence_matrix().astype(numpy.float64)
+		shared = incidence @ incidence.T
+		# The number of classes containing each segment; the classes containing either of two segments are the ones containing the first, plus the ones containing the second, minus the ones containing both
+		counts = incidence.sum(axis=1)
+		total = counts[:, None] + counts[None, :] - shared
+		with numpy.errstate(divide='ignore', invalid='ignore'):
+			return shared / total
+
+
+# The cache of natural classes. Each entry is a pickled NaturalClassSet (with its incidence matrix), in a file named by a hash of everything the classes depend on: the feature names, the segments and their feature values (in the order of the file), and the options. So a changed feature file just gets a new entry, and entries never need to be invalidated (the directory can be deleted at any time to clear it).
+default_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'class_cache')
+# Change this if the way classes are found or stored changes, so that old entries aren't used
+cache_version = 2
+
+def cache_key(features, segments, feature_matrix, specification='minimal', superclass='include', algorithm='pairwise'):
+	contents = repr((cache_version, features, segments, list(feature_matrix.items()), specification, superclass, algorithm))
+	return hashlib.sha256(contents.encode('utf-8')).hexdigest()
+
+# The NaturalClassSet for a feature matrix, from the cache if it has been found before, and otherwise found now and added to the cache. A cache_dir of None means not to use the cache at all
+def cached_class_set(features, segments, feature_matrix, specification='minimal', superclass='include', cache_dir=default_cache_dir, verbose=False, algorithm='pairwise'):
+	if cache_dir is None:
+		return NaturalClassSet(features, segments, feature_matrix, specification, superclass, verbose, algorithm)
+	try:
+		cache_file = open(cache_filename(cache_dir, features, segments, feature_matrix, specification, superclass, algorithm), 'rb')
+		class_set = pickle.load(cache_file)
+		cache_file.close()
+		# The warnings about illegal feature values are printed while finding the unitary classes, which is quick, so just do that part again
+		if verbose:
+			class_set.find_unitary_classes(verbose)
+		return class_set
+	# If there's no entry (or it can't be read), find the classes after all
+	except (IOError, EOFError, pickle.UnpicklingError):
+		pass
+
+	class_set = NaturalClassSet(features, segments, feature_matrix, specification, superclass, verbose, algorithm)
+	store_class_set(class_set, cache_dir, verbose)
+	return class_set
+
+def cache_filename(cache_dir, features, segments, feature_matrix, specification, superclass, algorithm):
+	return os.path.join(cache_dir, cache_key(features, segments, feature_matrix, specification, superclass, algorithm) + '.pickle')
+
+# Add a NaturalClassSet to the cache (replacing any entry for the same feature matrix and options)
+def store_class_set(class_set, cache_dir=default_cache_dir, verbose=False):
+	class_set.incidence_matrix()
+	# Write the entry under a temporary name and then rename it, so that another process never reads half an entry
+	try:
+		os.makedirs(cache_dir, exist_ok=True)
+		handle, temporary_filename = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+		cache_file = os.fdopen(handle, 'wb')
+		pickle.dump(class_set, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+		cache_file.close()
+		os.replace(temporary_filename, cache_filename(cache_dir, class_set.features, class_set.segments, class_set.feature_matrix, class_set.specification, class_set.superclass, class_set.algorithm))
+	except IOError as error:
+		if verbose:
+			print("Warning! Could not save natural classes in the cache: %s" % error)
+
+# The NaturalClassSet for a feature file, using the cache
+def load_class_set(feature_filename, specification='minimal', superclass='include', cache_dir=default_cache_dir, algorithm='pairwise'):
+	features, segments, feature_matrix = read_feature_file(feature_filename)
+	return cached_class_set(features, segments, feature_matrix, specification, superclass, cache_dir, algorithm=algorithm)
+
+# The similarity matrix for a feature file (see NaturalClassSet.similarity_matrix). The rows and columns are in the order of the segments in the file. Only the classes matter here, not their descriptions, so they are found by closure, which is quicker
+def similarity_matrix(feature_filename, specification='minimal', superclass='include', cache_dir=default_cache_dir):
+	return load_class_set(feature_filename, specification, superclass, cache_dir, 'closure').similarity_matrix()
+
+# The similarities of pairs of segments, worked out only as they are asked for, for scripts (like the neighbourhood and alignment tools) that look up a few pairs at a time rather than wanting the whole matrix.
+# Nothing is done until the first similarity is asked for; then the classes are loaded from the cache or found (by closure, as for similarity_matrix above), and each pair's similarity is worked out the first time it is asked for and remembered. Only the max_pairs pairs asked for most recently are remembered, so a big inventory never takes up a whole matrix.
+# The similarities are the same as in NaturalClassSet.similarity_matrix (nan for two segments that are in no classes at all), and the distance between two segments is 1 minus their similarity
+class SegmentSimilarity:
+	def __init__(self, feature_filename, specification='minimal', superclass='include', cache_dir=default_cache_dir, max_pairs=100000):
+		self.feature_filename = feature_filename
+		self.specification = specification
+		self.superclass = superclass
+		self.cache_dir = cache_dir
+		self.class_set = None
+		# The position of each segment in the feature file, and (once it has been needed) the classes that contain it, as a bitmask over the classes
+		self.segment_numbers = None
+		self.segment_classes = {}
+		self.pair_similarity = functools.lru_cache(maxsize=max_pairs)(self.find_similarity)
+
+	def load(self):
+		if self.class_set is None:
+			self.class_set = load_class_set(self.feature_filename, self.specification, self.superclass, self.cache_dir, 'closure')
+			self.segment_numbers = {seg: s for s, seg in enumerate(self.class_set.bit_segments)}
+		return self.class_set
+
+	# The segments, in the order of the feature file
+	def segments(self):
+		return self.load().bit_segments
+
+	# The classes containing a segment (by its position), from its row of the incidence matrix
+	def classes_containing(self, s):
+		if s not in self.segment_classes:
+			row = numpy.packbits(self.class_set.incidence_matrix()[s], bitorder='little')
+			self.segment_classes[s] = int.from_bytes(row.tobytes(), 'little')
+		return self.segment_classes[s]
+
+	# The similarity of the segments in positions s1 and s2, without remembering it
+	def find_similarity(self, s1, s2):
+		classes1 = self.classes_containing(s1)
+		classes2 = self.classes_containing(s2)
+		total = (classes1 | classes2).bit_count()
+		if total == 0:
+			return float('nan')
+		return (classes1 & classes2).bit_count() / total
+
+	def similarity(self, seg1, seg2):
+		self.load()
+		s1 = self.segment_numbers[seg1]
+		s2 = self.segment_numbers[seg2]
+		# The similarity is the same either way round, so each pair is remembered just once
+		if s1 > s2:
+			s1, s2 = s2, s1
+		return self.pair_similarity(s1, s2)
+
+	def distance(self, seg1, seg2):
+		return 1 - self.similarity(seg1, seg2)
+
+# The suffix for the similarity matrices written from here. The similarities here come from which classes each segment is actually in, but SimilarityCalculator.py finds the members of each class by matching the segments against a regular expression, which can give different similarities for inventories with segments of more than one character or with $ in them. So these matrices go in files of their own, rather than overwriting its .sim files
+matrix_suffix = '.matrix.sim'
+
+# Write a similarity matrix in the same format as the .sim files that SimilarityCalculator.py writes: a header row of segments, and then the upper triangle of the matrix, one row per segment
+def write_similarity_matrix(sim_matrix_filename, segments, matrix):
+	sim_matrix_file = open(sim_matrix_filename, 'w')
+	sim_matrix_file.write('\t%s\n' % '\t'.join(segments))
+	for s1 in range(len(segments)):
+		sim_matrix_file.write(segments[s1] + '\t'*s1)
+		for s2 in range(s1, len(segments)):
+			sim_matrix_file.write('\t%s' % float(matrix[s1, s2]))
+		sim_matrix_file.write('\n')
+	sim_matrix_file.close()
+
+
+if __name__ == "__main__":
+	if len(sys.argv) < 2:
+		print("Usage: python NaturalClasses.py feature_file [include|exclude]\n\twrites the similarity matrix to feature_file (without its extension) + %s" % matrix_suffix)
+		sys.exit()
+	feature_filename = sys.argv[1]
+	superclass = 'include'
+	if len(sys.argv) > 2:
+		superclass = sys.argv[2]
+	class_set = load_class_set(feature_filename, superclass=superclass, algorithm='closure')
+	sim_matrix_filename = re.sub(r'\.[^\.]*$', '', feature_filename) + matrix_suffix
+	write_similarity_matrix(sim_matrix_filename, class_set.bit_segments, class_set.similarity_matrix())
+	print("%s classes, %s segments (%s pairs of classes intersected); similarity matrix written to %s" % (len(class_set.classes), len(class_set.bit_segments), class_set.number_considered, sim_matrix_filename))
@@ -1,313 +1,140 @@
 # A script to calculate Frisch/Broe/Pierrehumbert similarity, based on a feature file
+# Run with no options (python SimilarityCalculator.py [feature_file]), it asks for anything it needs to know, as it always has.
+# Run with options, or with more than one feature file, it works through the files without asking anything, writing the .log, .stb, .cls and .sim files for each one (several at a time, in separate processes):
+#	python SimilarityCalculator.py --specification minimal --superclass include --processes 4 features/*.txt
+# The functions compute_classes() and compute_similarities() (and process_feature_file(), which does both for one file) can also be imported and used from other scripts.
 import sys
 import re
 import os.path
-import string
-from FeatureFileTools import cleanup_line
-
-# The name of the feature file to use
-if len(sys.argv) > 1:
-	feature_filename = sys.argv[1]
-else:
-	feature_filename = input('Enter name of feature file: ')
-	feature_filename = feature_filename.strip()
-
-# Try opening the file
-valid_feature_file = 0
-while valid_feature_file == 0:	
-	try:
-		feature_file = open(feature_filename, 'r')
-		valid_feature_file = 1
-	except IOError as e:
-		print ("Could not read features file %s: %s" % (feature_filename, e))
-		feature_filename = input('Enter name of feature file: ')
-
-
-# Now also the output files for the similarity table, natural classes, and similarity matrix.  
-# First, find the "prefix" of the feature filename
-filename_prefix = re.sub(r'\.[^\.]*$', '', feature_filename)
-log_filename = filename_prefix + '.log'
-similarity_table_filename = filename_prefix + '.stb'
-natural_class_filename = filename_prefix + '.cls'
-sim_matrix_filename = filename_prefix + '.sim'
-
-# Try opening the files
-
-# Check if they exist
-valid_files = False
-while valid_files == False:
-	if os.path.isfile(similarity_table_filename) or os.path.isfile(natural_class_filename) or os.path.isfile(sim_matrix_filename):
-		print( "\nFile %s, %s, or %s already exists." % (similarity_table_filename, natural_class_filename, sim_matrix_filename) )
-		print( "What should I do?" )
-		print( "\t1. Overwrite old files") 
-		print( "\t2. Save files under a new name")
-		response = input("? ")
-	
-		# If the response is '1', we can just go on (nothing to do)
-		if response == "1" or response == "1.":
-			valid_files = True
-		elif response == "2" or response == "2.":
-			filename_prefix = input( "Enter new prefix for filenames: " ).strip()
-			# If the newly given filename prefix ends in .stb, .cls, .sim then remove it
-			filename_prefix = re.sub(r'\.(stb|cls|sim)$', '', filename_prefix)
-			log_filename = filename_prefix + '.log'
-			similarity_table_filename = filename_prefix + '.stb'
-			natural_class_filename = filename_prefix + '.cls'
-			sim_matrix_filename = filename_prefix + '.sim'
-	else:
-		valid_files = True
-
-try:
-	log_file = open(log_filename, 'w')
-	similarity_table_file = open(similarity_table_filename, 'w')
-	natural_class_file = open(natural_class_filename, 'w')
-	sim_matrix_file = open(sim_matrix_filename, 'w')
-
-# Ungracefully, if there's a problem, quit (rather than giving the user another chance)
-except IOerror as error:
-	print("Error opening output files: %s" % error)
-	sys.exit()
-
-
-print('Select type of natural class descriptions to use:\n\t1. Contrastive underspecification (e.g., [u] = [+back, +high])\n\t2. Fully specified (e.g., [u] = [+back, +high, -low, +round])\n(The similarity results will be the same either way)')
-valid_specification = False
-while valid_specification == False:
-	specification = input('? ')
-	specification = specification.strip()
-	if specification == '1':
-		specification = 'minimal'
-		valid_specification = True
-	elif specification == '2':
-		specification = 'maximal'
-		valid_specification = True
-	else:
-		print("Sorry, I couldn't understand your response.  Please enter 1 or 2.")
-
-print("\nInclude the maximal superclass? (That is, the class that includes all known segments)\n\t1. Automatically include (a la Frisch)\n\t2. Exclude if not a genuine class (a la Zuraw) \n(These options yield slightly different absolute similarity values, but the same relative similarities)")	
-valid_superclass = False
-while valid_superclass == False:
-	superclass = input('? ')
-	superclass = superclass.strip()
-	if superclass == '1':
-		superclass = 'include'
-		valid_superclass = True
-	elif superclass == '2':
-		superclass = 'exclude'
-		valid_superclass = True
-	else:
-		print("Sorry, I couldn't understand your response.  Please enter 1 or 2.")	
-
-# Now we'll read the feature file
-print ("Feature file: %s" % feature_filename)
-feature_lines = feature_file.readlines()
-
-# The first line contains the feature names
-firstline = cleanup_line(feature_lines[0])
-# also for some reason these often begin without tabs, but just in case
-# they do have tabs
-firstline = re.sub(r'^\s+', '', firstline)
-features = firstline.split('\t')
-number_of_features = len(features)
-print("There are %s features in this file" % number_of_features)
-print(firstline)
-
-# Now the rest of the file, which contains the feature values
-feature_matrix = {}
-segments = []
-
-for line in feature_lines[1:]:
-	line = cleanup_line(line)
-	seg, *values = line.split("\t")
-	
-	# If the segment is a dollar sign, it needs to be protected
-	if seg == '$':
-#		seg = '$$'
-		print( "Segment $ may cause trouble.")
-	# Skip lines with a blank segment
-	if seg == '':
-		continue
-		
-	# Also ignore value-less lines, process only those lines with feature values
-	if len(values) > 0:
-		# If the first value is nothing but digits (and is not simply a 0), or is completely empty, it's a code (assuming no scalar features!! but this script can't handle scalar features, anyway)
-		if (re.match(r'^\d*$', values[0]) and values[0] != 0) or values[0] == "":
-			del values[0]
-		
-		print('Segment %s: %s' % (seg, ','.join(values)))
-		
-		# Store the segments in a list of segments, for convenience
-		segments.append(seg)
-		
-		# And remember the feature values
-		feature_matrix[seg] = values
-	
-		# A consistency check
-		if len(values) != number_of_features:
-			print('Warning! segments %s has an incorrect number of features. \(%s instead of %s\)' % (seg, len(values), number_of_features))	
-
-feature_file.close()	
-# Something we could do here: print the feature matrix to the log file, to double-check that it's been read correctly
-
-# Now construct the matrix of strings for unitary classes.
-# The structure for this will be: a list with the same length as the number of features.  Each entry will itself be a list, of length two: the '-' segments and the '+' segments
-
-# The following initializes a list of the necessary size
-unitary_classes = [ [[],[]] for i in range(number_of_features)]
-
-for seg, values in feature_matrix.items():
-	for f in range(0,len(values)):
-		if values[f] == '-':
-			unitary_classes[f][0].append(seg)
-		elif values[f] == '+':
-			unitary_classes[f][1].append(seg)
-		elif values[f] != '0':
-			print( 'Warning! Ignoring illegal feature value, number %s, for segment %s: %s'% (f,seg,values[f]))
-
-log_file.write('---------------------------------------------------------\nUnitary natural classes: \n')
-for f in range(number_of_features):
-	for val in (1,0):
-		log_file.write('[')
-		if val==1:
-			log_file.write('+')
-		else:
-			log_file.write('-')
-		log_file.write('%s]: %s\n' % (features[f], ' '.join(unitary_classes[f][val])))
-
-# Now that we have the unitary classes for all features, we can check which ones are unique, add them to the list of natural classes, and iterate from there
-classes = []
-number_of_classes = 0
-
-# A dictionary for how to describe each class, and how many features it takes
-descs = {}
-desc_lengths = {}
-for f in range(len(unitary_classes)):
-	# We need to consider both positive and negative values
-	for val in (0,1):
-		myclass = ' '.join(sorted(unitary_classes[f][val]))
-		# Sort the order of the segments, so we're sure to always have the same representation for the same set of segments. Let's separate segments with spaces, so that we can have segments with transcriptions longer than one character
-#		myclass = ' '.join(sorted(set(myclass)))
-		# The perl version had a line here to eliminate spaces that somehow sometimes creep in; not sure how that would happen, so not including it here for now
-		# If we've already discovered this class, it will have a description. If the class doesn't have a description, we need to add it
-		if myclass not in descs:
-			# Remember this class
-			classes.append(myclass)
-			number_of_classes += 1
-			
-			# Add the description to the dictionary of descriptions
-			if val == 1:
-				desc = '+' + features[f]
-			else:
-				desc = '-' + features[f]
-			descs[myclass] = desc
-			
-			# The unitary classes have length 1
-			desc_lengths[myclass] = 1
-
-# Remember how many distinct unitary classes we ended up with
-number_of_unitary_classes = number_of_classes
-
-
-# OK, so far we have a set of natural classes that includes all of the unique unitary classes.
-# The next step is to combine them to create classes with more complex descriptions.
-# We'll go through the ones we already know and compare.
-log_file.write( "Number of distinct unitary classes = %s\n\n" % number_of_unitary_classes)
-
-number_considered = 0
-for c1 in range(number_of_unitary_classes):
-	old_number_of_classes = number_of_classes
-	for c2 in range(c1+1,number_of_classes):
-		number_considered += 1
-		
-		# The perl script has some code for estimating how many more classes there are to consider, to give the user an estimate of progress. Skip this for now
-		# We find the candidate class, which is the intersection of the two classes
-		candidate_class = ' '.join(sorted(set(classes[c1].split(' ')).intersection(classes[c2].split(' '))))
-		
-	# proceed only if intersection is > 0
-		if len(candidate_class) > 0:
-			candidate_desc = descs[classes[c1]] + ", " + descs[classes[c2]]
-			# When using "overspecification", sometimes the two classes being merged will redundantly have a feature specification in common. We need to check for duplicates and weed them out.  It would be harmless to run the code below if we're using underspecified descriptions, but it would just take a little longer.
-			candidate_desc_set = set(candidate_desc.split(', '))
-			candidate_desc = ', '.join(candidate_desc_set)
-
-			candidate_length = len(candidate_desc_set)
-			
-			# If this is a new class, we need to add it
-			if candidate_class not in classes:
-				classes.append(candidate_class)
-				number_of_classes += 1
-				descs[candidate_class] = candidate_desc
-				desc_lengths[candidate_class] = candidate_length
-			else:
-			# If we've already seen this class, we don't need to add it, but we might want to replace its description with a new one, if there's a more compact way to describe the set
-				if specification == 'minimal':
-					if desc_lengths[candidate_class] > candidate_length:
-					# If this is true, the new description is shorter than the previously seen description. Since we want underspecification, let's keep it
-						descs[candidate_class] = candidate_desc
-						desc_lengths[candidate_class] = candidate_length
+import glob
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+from FeatureFileTools import parse_feature_lines, read_feature_file
+from NaturalClasses import cached_class_set, load_class_set, default_cache_dir
+from IncrementalClasses import update_class_set, update_similarity_matrix
+
+# Find the natural classes (see NaturalClasses.py), and write them to the log file and the natural class file, if they are given.
+# The specification can be 'minimal' or 'maximal', and the superclass 'include' or 'exclude' (see the questions asked in interactive_main() below). If verbose, warnings about illegal feature values and undescribable segments are printed.
+# Classes that have been found before for the same feature matrix and options are loaded from the cache directory (None to always find them again). If the classes have already been worked out some other way (e.g. by IncrementalClasses.update_class_set), they can be given as class_set, and are just written out.
+# The algorithm for finding the classes can be 'pairwise' or 'closure' (see NaturalClasses.py): they find the same classes, with fewer intersections for 'closure', but the descriptions can differ a little.
+# Returns the NaturalClassSet
+def compute_classes(features, segments, feature_matrix, specification='minimal', superclass='include', log_file=None, natural_class_file=None, verbose=False, cache_dir=default_cache_dir, class_set=None, algorithm='pairwise'):
+	# Each class is represented as a bitmask over the segments: the unitary classes, described by a single feature value, and then all of their intersections
+	if class_set is None:
+		class_set = cached_class_set(features, segments, feature_matrix, specification, superclass, cache_dir, verbose, algorithm)
+	if log_file is None and natural_class_file is None:
+		return class_set
+
+	if log_file is not None:
+		log_file.write('---------------------------------------------------------\nUnitary natural classes: \n')
+		for f in range(len(features)):
+			for val in (1,0):
+				log_file.write('[')
+				if val==1:
+					log_file.write('+')
 				else:
-					if desc_lengths[candidate_class] < candidate_length:
-					# If this is true, the new description is longer than the previously seen description. Since we want maximal specification, let's keep it.
-						descs[candidate_class] = candidate_desc
-						desc_lengths[candidate_class] = candidate_length
-						
-
-# Now, if desired, add the "null description" class, which contains all of the segments
-if superclass == 'include':
-	totalclass = ' '.join(sorted(segments))
-	if totalclass not in classes:
-		classes.append(totalclass)
-		number_of_classes += 1
-		descs[totalclass] = ''
-		# Should the 'length' of this description be 1, or 0?  It probably does not matter, if we add it after the unitary classes, so that "actual" featural descriptions get priority
-		desc_lengths[totalclass] = 0
-
-
-# Now that we have the full list of classes, it's intuitive to sort them by the length of the description.  (The perl script sorted by the number of segments in the class, but that's less intuitive)
-classes = sorted(classes, key=lambda x: desc_lengths[x])
-
-log_file.write("---------------------------------------------------------\nAll natural classes:\n")
-for c in classes:
-	log_file.write("\t%s\t%s\t%s\n" % (c,desc_lengths[c], descs[c]))
-	natural_class_file.write("%s\t%s\t%s\n" % (c,desc_lengths[c], descs[c]))
-
-# Generally, one would like their feature system to provide a unique description for each segment in the inventory; but with privative features, this can sometimes be tricky (it's easy to accidentally distinguish a phoneme with a privative feature, and leave it's "unmarked" counterpart undescribable.
-# So, we perform a check to make sure that all segments are describable.
-log_file.write("\n---------------------------------------------------------\nClass keys:\n\t%s\n" % "\n\t".join(descs.keys()))
-log_file.write("\n---------------------------------------------------------\nOptimal descriptions of each phoneme using features:\n")
-for seg in segments:
-	log_file.write(seg + '\t')
-	try:
-		log_file.write(descs[seg] + '\n')
-	except KeyError as error:
-#		print('Warning: segment [%s] is not uniquely describable using this feature set.' % seg)
-		print('Warning: %s is not uniquely describable' % error)
-		# Tell the user at least one segment that it cannot be distinguished from. In order to do this, find the shortest (smallest) class containing the segment.
-#		containing_classes = filter(seg, sorted(classes, key= lambda x: len(classes[x]), reverse = True))# xxx
-#		print('\tSegment does not contrast with {%s}\n\tFeatures: %s\n' % containing_classes[0], descs[containing_classes[0]])
-
-########### Now moving on to calculating similarities
-# One approach is to search all of the classes using a string representation, that we'll use to search. We assume that a tab is not an actual character in any transcription
-all_classes = '\t'+'\t'.join(classes)+'\t'
-#log_file.write("\nString of all classes:\n%s\n\n" % all_classes)
-
-# Let's do pairwise segmental similarities for now.
-# First, a header row for the similarity table file
-similarity_table_file.write('Seg1\tSeg2\tShared\tTotal\tSimilarity\tShared classes\tSeg1 only\tSeg2 only\n')
-# And also a header row for the similarity matrix file
-sim_matrix_file.write('\t%s\n' % '\t'.join(segments))
-
-for s1 in range(len(segments)):
-	seg1 = segments[s1]
-	
-	sim_matrix_file.write(seg1 + '\t'*s1)
-	
-	for s2 in range(s1,len(segments)):
-		seg2 = segments[s2]
-
-		# We'll search for clases that contain both seg1 and seg2. For consistency, we've listed all classes in alphabetical order.  So, start by putting these in alphabetical order
-		segs = sorted( seg1+seg2 )
+					log_file.write('-')
+				log_file.write('%s]: %s\n' % (features[f], ' '.join(class_set.class_segments(class_set.unitary_classes[f][val]))))
+
+		log_file.write( "Number of distinct unitary classes = %s\n\n" % class_set.number_of_unitary_classes)
+
+	# The classes are sorted by the length of their descriptions. In the output files, they are referred to by their string representations (the order of the classes and of the descriptions stays the same)
+	classes, descs, desc_lengths = class_strings(class_set)
+
+	if log_file is not None:
+		log_file.write("---------------------------------------------------------\nAll natural classes:\n")
+	for c in classes:
+		if log_file is not None:
+			log_file.write("\t%s\t%s\t%s\n" % (c,desc_lengths[c], descs[c]))
+		if natural_class_file is not None:
+			natural_class_file.write("%s\t%s\t%s\n" % (c,desc_lengths[c], descs[c]))
+
+	if log_file is None:
+		return class_set
+
+	# Generally, one would like their feature system to provide a unique description for each segment in the inventory; but with privative features, this can sometimes be tricky (it's easy to accidentally distinguish a phoneme with a privative feature, and leave it's "unmarked" counterpart undescribable.
+	# So, we perform a check to make sure that all segments are describable.
+	log_file.write("\n---------------------------------------------------------\nClass keys:\n\t%s\n" % "\n\t".join(descs.keys()))
+	log_file.write("\n---------------------------------------------------------\nOptimal descriptions of each phoneme using features:\n")
+	for seg in segments:
+		log_file.write(seg + '\t')
+		try:
+			log_file.write(descs[seg] + '\n')
+		except KeyError as error:
+			if verbose:
+#				print('Warning: segment [%s] is not uniquely describable using this feature set.' % seg)
+				print('Warning: %s is not uniquely describable' % error)
+			# Tell the user at least one segment that it cannot be distinguished from. In order to do this, find the shortest (smallest) class containing the segment.
+#			containing_classes = filter(seg, sorted(classes, key= lambda x: len(classes[x]), reverse = True))# xxx
+#			print('\tSegment does not contrast with {%s}\n\tFeatures: %s\n' % containing_classes[0], descs[containing_classes[0]])
+
+	return class_set
+
+# The classes of a NaturalClassSet as strings, in sorted order, and dictionaries of their descriptions and description lengths, keyed by those strings
+def class_strings(class_set):
+	classes = [class_set.names[c] for c in class_set.classes]
+	descs = {class_set.names[c]: class_set.descs[c] for c in class_set.descs}
+	desc_lengths = {class_set.names[c]: class_set.desc_lengths[c] for c in class_set.desc_lengths}
+	return classes, descs, desc_lengths
+
+
+# The similarity table is written in pieces of about this many characters: for for a big inventory can run to gigabytes, so it is never held in memory all at once, but it isn't written a little at a time either
+write_chunk_size = 1 << 20
+
+# Characters that mean something special in a regular expression: a pair involving one of these can't be looked up in the index, and is searched for with the regular expressions
+regex_special_characters = set('\\.^$*+?{}[]|()')
+
+# One approach to finding the classes that two segments share is to search all of the classes using a string representation. We assume that a tab is not an actual character in any transcription.
+# Searching that string with regular expressions for every pair of segments takes a long time when there are many classes, though. So instead, we make an inverted index once: for each segment, a bitmask of the classes that contain it (bit k stands for classes[k]). Then the classes that contain both of two segments are just an &, and the classes that contain one but not the other are an & with a ~.
+class ClassIndex:
+	def __init__(self, classes):
+		self.classes = classes
+		self.number_of_bytes = (len(classes) + 7) // 8
+		self.all_classes = '\t'+'\t'.join(classes)+'\t'
+		# For each segment, the classes that contain it, and the classes that contain it more than once (which only happens in the superclass, when a segment is on more than one line of the feature file)
+		self.containing = {}
+		self.containing_twice = {}
+		# And for each character, the classes that contain a segment beginning with that character, and the classes that contain more than one
+		self.beginning_with = {}
+		self.beginning_with_twice = {}
+		containing = self.containing
+		containing_twice = self.containing_twice
+		beginning_with = self.beginning_with
+		beginning_with_twice = self.beginning_with_twice
+		for k in range(len(classes)):
+			bit = 1 << k
+			for seg in classes[k].split(' '):
+				if seg == '':
+					continue
+				if containing.get(seg, 0) & bit:
+					containing_twice[seg] = containing_twice.get(seg, 0) | bit
+				containing[seg] = containing.get(seg, 0) | bit
+				if beginning_with.get(seg[0], 0) & bit:
+					beginning_with_twice[seg[0]] = beginning_with_twice.get(seg[0], 0) | bit
+				beginning_with[seg[0]] = beginning_with.get(seg[0], 0) | bit
+
+	# The classes in a bitmask, in the order of the list of classes. Taking the bits off one at a time means going over the whole mask (one bit per class) for each of them, so instead the mask is unpacked into an array of bits all at once
+	def mask_classes(self, mask):
+		if not mask:
+			return []
+		bits = numpy.unpackbits(numpy.frombuffer(mask.to_bytes(self.number_of_bytes, 'little'), dtype=numpy.uint8), bitorder='little')
+		classes = self.classes
+		return [classes[k] for k in numpy.flatnonzero(bits).tolist()]
+
+	# The searches below are described in terms of the two "segments" segs[0] and segs[1] that the regular expressions look for. These are the two segments in alphabetical order when they are one character long, but in general they are the first two characters of the two segments' names, sorted together, and the index searches have to find exactly the classes that the regular expressions would
+	# Returns the shared classes, and the classes with just segs[1] or just segs[0]
+	def search(self, segs):
+		if segs[0] in regex_special_characters or segs[1] in regex_special_characters:
+			return self.regex_search(segs)
+		return self.index_search(segs)
+
+	# Find the shared classes, and the classes with just segs[1] or just segs[0], using the regular expressions
+	def regex_search(self, segs):
 		# A class contains just seg1 to the exclusion of seg2 if it contains seg1, and otherwise, from edge to edge (where edge is a boundary or a tab), it is composed of material that is not seg2.  A class contains both if it contains the two, in that order, with possibly other material on either side.
-		
+
 		seg1_regex = r'(?<=[\t])((((?:(?!' + segs[0] + '))[^\t ]* )*)' + segs[1] + '( (?:(?!' + segs[0] + ')[^\t ]*))*)(?=[\t])'
 		seg2_regex = r'(?<=[\t])((((?:(?!' + segs[1] + '))[^\t ]* )*)' + segs[0] + '( (?:(?!' + segs[1] + ')[^\t ]*))*)(?=[\t])'
 #		seg1_regex = '(?<=[\t])' + '[^\t'+ segs[1] +']*'+ segs[0] + '[^\t'+ segs[1] +']*' + '(?=[\t])'
@@ -317,51 +144,337 @@ for s1 in range(len(segments)):
 
 #		shared_regex  = '(?<=[\t])' + '[^\t]*'+ segs[0] + '[^\t]*' + segs[1] + '[^\t]*' + '(?=[\t])'
 
-		shared = re.findall(shared_regex, all_classes)
-		seg1_classes = re.findall(seg1_regex, all_classes)
-		seg2_classes = re.findall(seg2_regex, all_classes)
-		
-		# If seg1 and seg2 are the same, then the unshared are actually nil (both lists are identical)
-		if seg1 == seg2:
-			# The right regex to use in this case is just the one character one
-			# Maybe we could have done this more efficiently by doing just one search in the first place
-			shared = seg1_classes.copy()
-			seg1_classes = []
-			seg2_classes = []
-
-		total = len(shared) + len(seg1_classes) + len(seg2_classes)
-		if total == 0:
-			print( 'Warning! %s and %s have %s shared, %s,%s unshared. Total of zero.' % (seg1, seg2, len(shared), len(seg1_classes), len(seg2_classes)) )
+		# re.findall returns tuples of captures, but it's convenient to have the classes themselves, as strings
+		shared = [item[0] for item in re.findall(shared_regex, self.all_classes)]
+		seg1_classes = [item[0] for item in re.findall(seg1_regex, self.all_classes)]
+		seg2_classes = [item[0] for item in re.findall(seg2_regex, self.all_classes)]
+		return shared, seg1_classes, seg2_classes
+
+	# The same thing, using the index
+	def index_search(self, segs):
+		first, second = segs[0], segs[1]
+		containing = self.containing
+		if first != second:
+			# A shared class contains both; a class with just one contains it, and no segment that begins with the other one
+			shared = containing.get(first, 0) & containing.get(second, 0)
+			seg1_classes = containing.get(second, 0) & ~self.beginning_with.get(first, 0)
+			seg2_classes = containing.get(first, 0) & ~self.beginning_with.get(second, 0)
+		else:
+			# A "shared" class contains it twice; a class with "just one" contains it, and no other segment that begins with it
+			shared = self.containing_twice.get(first, 0)
+			seg1_classes = containing.get(first, 0) & ~self.beginning_with_twice.get(first, 0)
+			seg2_classes = seg1_classes
+		return self.mask_classes(shared), self.mask_classes(seg1_classes), self.mask_classes(seg2_classes)
+
+
+# Calculate the similarity of each pair of segments (each segment with itself and with the segments after it in the feature file), and write them to the similarity table and similarity matrix files, if they are given.
+# The similarity table lists the shared and unshared classes for each pair, which makes it very big for a big inventory; with descriptions=False, it has just the numbers. If a matrix (a square NumPy array, one row and column per segment) is given, the similarities are also put in it, both ways round.
+# Returns a dictionary of the similarities, keyed by (seg1, seg2)
+def compute_similarities(class_set, similarity_table_file=None, sim_matrix_file=None, verbose=False, descriptions=True, matrix=None):
+	segments = class_set.segments
+	classes, descs, desc_lengths = class_strings(class_set)
+	index = ClassIndex(classes)
+	similarities = {}
+	# The descriptions of the classes, as they are listed in the similarity table
+	bracketed = {c: '[' + descs[c] + ']' for c in descs}
+	# The rows of the similarity table that haven't been written yet, and how long they are
+	table_rows = []
+	table_length = 0
+
+	# Let's do pairwise segmental similarities for now.
+	# First, a header row for the similarity table file
+	if similarity_table_file is not None:
+		if descriptions:
+			similarity_table_file.write('Seg1\tSeg2\tShared\tTotal\tSimilarity\tShared classes\tSeg1 only\tSeg2 only\n')
 		else:
-			similarity = float(len(shared)) / total
+			similarity_table_file.write('Seg1\tSeg2\tShared\tTotal\tSimilarity\n')
+	# And also a header row for the similarity matrix file
+	if sim_matrix_file is not None:
+		sim_matrix_file.write('\t%s\n' % '\t'.join(segments))
+
+	for s1 in range(len(segments)):
+		seg1 = segments[s1]
+		matrix_row = [seg1 + '\t'*s1]
+
+		for s2 in range(s1,len(segments)):
+			seg2 = segments[s2]
+
+			# We'll search for clases that contain both seg1 and seg2. For consistency, we've listed all classes in alphabetical order.  So, start by putting these in alphabetical order
+			segs = sorted( seg1+seg2 )
+			shared, seg1_classes, seg2_classes = index.search(segs)
+
+			# If seg1 and seg2 are the same, then the unshared are actually nil (both lists are identical)
+			if seg1 == seg2:
+				# The right search to use in this case is just the one character one
+				# Maybe we could have done this more efficiently by doing just one search in the first place
+				shared = seg1_classes.copy()
+				seg1_classes = []
+				seg2_classes = []
+
+			total = len(shared) + len(seg1_classes) + len(seg2_classes)
+			if total == 0:
+				if verbose:
+					print( 'Warning! %s and %s have %s shared, %s,%s unshared. Total of zero.' % (seg1, seg2, len(shared), len(seg1_classes), len(seg2_classes)) )
+			else:
+				similarity = float(len(shared)) / total
+			similarities[(seg1, seg2)] = similarity
+			if matrix is not None:
+				matrix[s1, s2] = similarity
+				matrix[s2, s1] = similarity
+
+			if similarity_table_file is not None:
+				if descriptions:
+					# In order to print out the list of shared and unshared classes, we add their descriptions
+					row = '%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' % (seg1, seg2, len(shared), total , similarity, ', '.join([bracketed[x] for x in shared]),  ', '.join([bracketed[x] for x in seg1_classes]), ','.join([bracketed[x] for x in seg2_classes]), )
+				else:
+					row = '%s\t%s\t%s\t%s\t%s\n' % (seg1, seg2, len(shared), total, similarity)
+				table_rows.append(row)
+				table_length += len(row)
+				if table_length >= write_chunk_size:
+					similarity_table_file.write(''.join(table_rows))
+					table_rows = []
+					table_length = 0
 
-#		similarity_table_file.write('%s\t%s\t%s\t%s\t%s\n' % (seg1, seg2, len(shared), total , similarity))
+			matrix_row.append('\t%s' % similarity)
 
-		# In order to print out the list of shared and unshared classes, it's convenient to get the lists into strings, rather than the tuples of captures returned by re.findall.
-		shared_list = [''.join(item[0]) for item in shared]
-		shared_list_descs = [ descs[x] for x in shared_list ]
-		shared_list_descs = [ '[' + x + ']' for x in shared_list_descs ]
-		shared_list = [ '{' + x + '}' for x in shared_list]
+		# At the end of each seg1 segment, write its line of the similarity matrix file
+		if sim_matrix_file is not None:
+			matrix_row.append('\n')
+			sim_matrix_file.write(''.join(matrix_row))
 
-		seg1_classes_list = [''.join(item[0]) for item in seg1_classes]
-		seg1_classes_list_descs = [ descs[x] for x in seg1_classes_list ]
-		seg1_classes_list_descs = [ '[' + x + ']' for x in seg1_classes_list_descs ]
-		seg1_classes_list = [ '{' + x + '}' for x in seg1_classes_list]
+	if table_rows:
+		similarity_table_file.write(''.join(table_rows))
 
-		seg2_classes_list = [''.join(item[0]) for item in seg2_classes]
-		seg2_classes_list_descs = [ descs[x] for x in seg2_classes_list ]
-		seg2_classes_list_descs = [ '[' + x + ']' for x in seg2_classes_list_descs ]
-		seg2_classes_list = [ '{' + x + '}' for x in seg2_classes_list]
+	return similarities
 
-		similarity_table_file.write( '%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' % (seg1, seg2, len(shared), total , similarity, ', '.join(shared_list_descs),  ', '.join(seg1_classes_list_descs), ','.join(seg2_classes_list_descs), ))
-		
-		sim_matrix_file.write('\t%s' % similarity)
+# Write the similarities in a compact form for other programs to read: the matrix as a NumPy .npy file (row and column k are for segment k), and the segments, one per line in the same order, as a .segments file
+def write_binary_similarities(filename_prefix, segments, matrix):
+	numpy.save(filename_prefix + '.npy', matrix)
+	segment_file = open(filename_prefix + '.segments', 'w')
+	segment_file.write(''.join(seg + '\n' for seg in segments))
+	segment_file.close()
+
+
+# The names of the output files for a feature file: the feature filename without its extension, plus .log, .stb, .cls and .sim
+def output_filenames(filename_prefix):
+	return filename_prefix + '.log', filename_prefix + '.stb', filename_prefix + '.cls', filename_prefix + '.sim'
+
+# Do everything for one feature file, without asking anything: read it, find the classes and the similarities, and write the output files (next to the feature file, unless another filename prefix is given).
+# If an earlier version of the feature file is given as previous_filename, the classes are updated from its classes (see IncrementalClasses.py) instead of being found from scratch, and the pairs of segments whose similarity changed are written to a .changes file (with the similarities as in NaturalClassSet.similarity_matrix).
+# With descriptions=False, the similarity table leaves out the lists of shared and unshared classes; with binary=True, the similarities are also written as .npy and .segments files (see write_binary_similarities()).
+# Returns the number of segments, the number of classes, the number of pairs of classes that were intersected to find them, and the number of pairs of segments whose similarity changed (None if there was no previous version)
+def process_feature_file(feature_filename, specification='minimal', superclass='include', filename_prefix=None, verbose=False, cache_dir=default_cache_dir, previous_filename=None, algorithm='pairwise', descriptions=True, binary=False):
+	if filename_prefix is None:
+		filename_prefix = re.sub(r'\.[^\.]*$', '', feature_filename)
+	log_filename, similarity_table_filename, natural_class_filename, sim_matrix_filename = output_filenames(filename_prefix)
+
+	features, segments, feature_matrix = read_feature_file(feature_filename, verbose)
+
+	log_file = open(log_filename, 'w')
+	similarity_table_file = open(similarity_table_filename, 'w')
+	natural_class_file = open(natural_class_filename, 'w')
+	sim_matrix_file = open(sim_matrix_filename, 'w')
+
+	class_set = None
+	if previous_filename is not None:
+		previous_class_set = load_class_set(previous_filename, specification, superclass, cache_dir, algorithm)
+		# The updated classes are not added to the cache: their descriptions and order can differ from the ones found from scratch, which later runs on this file would expect to get from it
+		class_set, affected = update_class_set(previous_class_set, features, segments, feature_matrix, verbose)
+	class_set = compute_classes(features, segments, feature_matrix, specification, superclass, log_file, natural_class_file, verbose, cache_dir, class_set, algorithm)
+	matrix = None
+	if binary:
+		matrix = numpy.zeros((len(segments), len(segments)))
+	compute_similarities(class_set, similarity_table_file, sim_matrix_file, verbose, descriptions, matrix)
+
+	log_file.close()
+	similarity_table_file.close()
+	natural_class_file.close()
+	sim_matrix_file.close()
+	if binary:
+		write_binary_similarities(filename_prefix, segments, matrix)
+
+	if previous_filename is None:
+		return len(segments), len(class_set.classes), class_set.number_considered, None
+	matrix, changes = update_similarity_matrix(previous_class_set, previous_class_set.similarity_matrix(), class_set, affected)
+	changes_file = open(filename_prefix + '.changes', 'w')
+	changes_file.write('Seg1\tSeg2\tOld similarity\tNew similarity\n')
+	for seg1, seg2, old_similarity, new_similarity in changes:
+		changes_file.write('%s\t%s\t%s\t%s\n' % (seg1, seg2, old_similarity, new_similarity))
+	changes_file.close()
+	return len(segments), len(class_set.classes), class_set.number_considered, len(changes)
+
+# process_feature_file() for one file of a batch: errors are reported rather than raised, so that one bad file doesn't stop the rest
+def batch_process(feature_filename, specification, superclass, cache_dir, previous_filename, algorithm, descriptions, binary):
+	start = time.perf_counter()
+	try:
+		number_of_segments, number_of_classes, number_considered, number_changed = process_feature_file(feature_filename, specification, superclass, cache_dir=cache_dir, previous_filename=previous_filename, algorithm=algorithm, descriptions=descriptions, binary=binary)
+	except (IOError, IndexError, ValueError) as error:
+		return "%s: failed (%s)" % (feature_filename, error)
+	summary = "%s: %s segments, %s classes (%s pairs of classes intersected)" % (feature_filename, number_of_segments, number_of_classes, number_considered)
+	if number_changed is not None:
+		summary += ", %s pairs changed since %s" % (number_changed, previous_filename)
+	return summary + ", %.2f sec" % (time.perf_counter() - start)
+
+# Process a list of feature files in a pool of processes (started by forking where possible), printing a line about each one as it is done
+def batch_main(feature_filenames, specification, superclass, processes=None, skip_existing=False, cache_dir=default_cache_dir, previous_filename=None, algorithm='pairwise', descriptions=True, binary=False):
+	if processes is None:
+		processes = os.cpu_count()
+	if skip_existing:
+		remaining = []
+		for feature_filename in feature_filenames:
+			if any(os.path.isfile(filename) for filename in output_filenames(re.sub(r'\.[^\.]*$', '', feature_filename))):
+				print("%s: skipped (output files already exist)" % feature_filename)
+			else:
+				remaining.append(feature_filename)
+		feature_filenames = remaining
+	if "fork" in multiprocessing.get_all_start_methods():
+		context = multiprocessing.get_context("fork")
+	else:
+		context = multiprocessing.get_context()
+	executor = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+	futures = [executor.submit(batch_process, feature_filename, specification, superclass, cache_dir, previous_filename, algorithm, descriptions, binary) for feature_filename in feature_filenames]
+	for future in futures:
+		print(future.result())
+	executor.shutdown()
+
+
+# The original way of running the script: ask for the feature file (if it wasn't given), what to do about existing output files, and the specification and superclass options
+def interactive_main(feature_filename=None, cache_dir=default_cache_dir):
+	# The name of the feature file to use
+	if feature_filename is None:
+		feature_filename = input('Enter name of feature file: ')
+		feature_filename = feature_filename.strip()
+
+	# Try opening the file
+	valid_feature_file = 0
+	while valid_feature_file == 0:
+		try:
+			feature_file = open(feature_filename, 'r')
+			valid_feature_file = 1
+		except IOError as e:
+			print ("Could not read features file %s: %s" % (feature_filename, e))
+			feature_filename = input('Enter name of feature file: ')
+
+
+	# Now also the output files for the similarity table, natural classes, and similarity matrix.
+	# First, find the "prefix" of the feature filename
+	filename_prefix = re.sub(r'\.[^\.]*$', '', feature_filename)
+	log_filename, similarity_table_filename, natural_class_filename, sim_matrix_filename = output_filenames(filename_prefix)
+
+	# Try opening the files
+
+	# Check if they exist
+	valid_files = False
+	while valid_files == False:
+		if os.path.isfile(similarity_table_filename) or os.path.isfile(natural_class_filename) or os.path.isfile(sim_matrix_filename):
+			print( "\nFile %s, %s, or %s already exists." % (similarity_table_filename, natural_class_filename, sim_matrix_filename) )
+			print( "What should I do?" )
+			print( "\t1. Overwrite old files")
+			print( "\t2. Save files under a new name")
+			response = input("? ")
+
+			# If the response is '1', we can just go on (nothing to do)
+			if response == "1" or response == "1.":
+				valid_files = True
+			elif response == "2" or response == "2.":
+				filename_prefix = input( "Enter new prefix for filenames: " ).strip()
+				# If the newly given filename prefix ends in .stb, .cls, .sim then remove it
+				filename_prefix = re.sub(r'\.(stb|cls|sim)$', '', filename_prefix)
+				log_filename, similarity_table_filename, natural_class_filename, sim_matrix_filename = output_filenames(filename_prefix)
+		else:
+			valid_files = True
+
+	try:
+		log_file = open(log_filename, 'w')
+		similarity_table_file = open(similarity_table_filename, 'w')
+		natural_class_file = open(natural_class_filename, 'w')
+		sim_matrix_file = open(sim_matrix_filename, 'w')
+
+	# Ungracefully, if there's a problem, quit (rather than giving the user another chance)
+	except IOError as error:
+		print("Error opening output files: %s" % error)
+		sys.exit()
+
+
+	print('Select type of natural class descriptions to use:\n\t1. Contrastive underspecification (e.g., [u] = [+back, +high])\n\t2. Fully specified (e.g., [u] = [+back, +high, -low, +round])\n(The similarity results will be the same either way)')
+	valid_specification = False
+	while valid_specification == False:
+		specification = input('? ')
+		specification = specification.strip()
+		if specification == '1':
+			specification = 'minimal'
+			valid_specification = True
+		elif specification == '2':
+			specification = 'maximal'
+			valid_specification = True
+		else:
+			print("Sorry, I couldn't understand your response.  Please enter 1 or 2.")
+
+	print("\nInclude the maximal superclass? (That is, the class that includes all known segments)\n\t1. Automatically include (a la Frisch)\n\t2. Exclude if not a genuine class (a la Zuraw) \n(These options yield slightly different absolute similarity values, but the same relative similarities)")
+	valid_superclass = False
+	while valid_superclass == False:
+		superclass = input('? ')
+		superclass = superclass.strip()
+		if superclass == '1':
+			superclass = 'include'
+			valid_superclass = True
+		elif superclass == '2':
+			superclass = 'exclude'
+			valid_superclass = True
+		else:
+			print("Sorry, I couldn't understand your response.  Please enter 1 or 2.")
+
+	# Now we'll read the feature file
+	print ("Feature file: %s" % feature_filename)
+	feature_lines = feature_file.readlines()
+
+	# The first line contains the feature names, and the rest of the file contains the feature values
+	features, segments, feature_matrix = parse_feature_lines(feature_lines, verbose=True)
+
+	feature_file.close()
+	# Something we could do here: print the feature matrix to the log file, to double-check that it's been read correctly
+
+	# Now find the natural classes, and then the similarities
+	class_set = compute_classes(features, segments, feature_matrix, specification, superclass, log_file, natural_class_file, True, cache_dir)
+	compute_similarities(class_set, similarity_table_file, sim_matrix_file, verbose=True)
+
+	log_file.close()
+	similarity_table_file.close()
+	natural_class_file.close()
+	sim_matrix_file.close()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Calculate Frisch/Broe/Pierrehumbert similarities from feature files. With no options and at most one feature file, the script asks for anything it needs; otherwise it processes all of the files without asking.")
+	parser.add_argument("feature_files", nargs="*", help="feature files (wildcards such as features/*.txt are expanded)")
+	parser.add_argument("--specification", choices=["minimal", "maximal"], help="natural class descriptions: contrastive underspecification (minimal, the default) or fully specified (maximal)")
+	parser.add_argument("--superclass", choices=["include", "exclude"], help="always include the class of all segments (include, the default), or only if it is a genuine class (exclude)")
+	parser.add_argument("--processes", type=int, help="how many files to process at once (default: one per CPU)")
+	parser.add_argument("--skip-existing", action="store_true", help="skip feature files whose output files already exist (by default they are overwritten)")
+	parser.add_argument("--cache-dir", default=default_cache_dir, help="where to keep the natural classes found for each feature matrix (default: %(default)s)")
+	parser.add_argument("--no-cache", action="store_true", help="always find the natural classes again, without using the cache")
+	parser.add_argument("--algorithm", choices=["pairwise", "closure"], help="how to find the natural classes: intersecting them pairwise (the default, as in the perl version), or by closure, which needs far fewer intersections (the classes are the same, but the descriptions may differ a little)")
+	parser.add_argument("--previous", help="an earlier version of the feature file: update its classes instead of finding them from scratch, and write the pairs whose similarity changed to a .changes file")
+	parser.add_argument("--no-descriptions", action="store_true", help="leave the lists of shared and unshared classes out of the .stb files, which makes them much smaller")
+	parser.add_argument("--binary", action="store_true", help="also write each similarity matrix as a NumPy .npy file, with the segments in order in a .segments file")
+	args = parser.parse_args()
+	cache_dir = None if args.no_cache else args.cache_dir
+
+	# Expand any wildcards (a pattern that matches nothing is kept, so that it gets reported as a missing file)
+	feature_filenames = []
+	for pattern in args.feature_files:
+		feature_filenames += sorted(glob.glob(pattern)) or [pattern]
+
+	batch = args.specification is not None or args.superclass is not None or args.processes is not None or args.skip_existing or args.algorithm is not None or args.previous is not None or args.no_descriptions or args.binary or args.no_cache or args.cache_dir != default_cache_dir or len(feature_filenames) > 1
+	if not batch:
+		if len(feature_filenames) == 1:
+			interactive_main(feature_filenames[0], cache_dir)
+		else:
+			interactive_main(cache_dir=cache_dir)
+		return
 
-	# At the end of each seg1 segment, start a new line in the similarity matrix file
-	sim_matrix_file.write('\n')
+	batch_main(feature_filenames, args.specification or 'minimal', args.superclass or 'include', args.processes, args.skip_existing, cache_dir, args.previous, args.algorithm or 'pairwise', not args.no_descriptions, args.binary)
 
 
-log_file.close()
-similarity_table_file.close()
-natural_class_file.close()
-sim_matrix_file.close()
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,57 @@
+# A check that updating the classes from an earlier version of a feature file (SimilarityCalculator.py --previous) doesn't change what later runs write.
+# The updated classes are the same as the ones found from scratch, but their descriptions and order can differ (see IncrementalClasses.py), so if they ended up in the class cache, a later cached run on the new file would write different .log, .stb, .cls and .sim files from a run with no cache.
+# This makes a new version of a feature file (by leaving out one segment, and by changing one segment's value for one feature), runs SimilarityCalculator on it with --previous, then again with the cache and then with no cache at all, and checks that the last two runs wrote exactly the same files. It exits with an error if they didn't
+# Usage: python check_incremental_cache.py [feature_file]
+import os
+import sys
+import tempfile
+
+from SimilarityCalculator import process_feature_file, output_filenames
+
+if len(sys.argv) > 1:
+	feature_filename = sys.argv[1]
+else:
+	feature_filename = "EnglishFeatures.txt"
+
+feature_file = open(feature_filename, 'r')
+lines = feature_file.readlines()
+feature_file.close()
+
+# The new versions of the file: without its last segment, and with the first segment's value for the last feature changed to the one the second segment has
+second_fields = lines[2].rstrip("\r\n").split("\t")
+changed_fields = lines[1].rstrip("\r\n").split("\t")
+changed_fields[-1] = second_fields[-1]
+if changed_fields == lines[1].rstrip("\r\n").split("\t"):
+	changed_fields[-1] = lines[-1].rstrip("\r\n").split("\t")[-1]
+versions = [
+	("removed", lines[:-1]),
+	("changed", [lines[0], "\t".join(changed_fields) + "\n"] + lines[2:]),
+]
+
+differences = 0
+directory = tempfile.TemporaryDirectory()
+for name, new_lines in versions:
+	cache_dir = os.path.join(directory.name, name + "_cache")
+	new_filename = os.path.join(directory.name, name + ".txt")
+	new_file = open(new_filename, 'w')
+	new_file.writelines(new_lines)
+	new_file.close()
+
+	process_feature_file(new_filename, filename_prefix=os.path.join(directory.name, name + "_incremental"), cache_dir=cache_dir, previous_filename=feature_filename)
+	process_feature_file(new_filename, filename_prefix=os.path.join(directory.name, name + "_cached"), cache_dir=cache_dir)
+	process_feature_file(new_filename, filename_prefix=os.path.join(directory.name, name + "_uncached"), cache_dir=None)
+
+	for cached_filename, uncached_filename in zip(output_filenames(os.path.join(directory.name, name + "_cached")), output_filenames(os.path.join(directory.name, name + "_uncached"))):
+		cached_file = open(cached_filename, 'rb')
+		uncached_file = open(uncached_filename, 'rb')
+		if cached_file.read() != uncached_file.read():
+			differences += 1
+			print("%s: the cached run after the incremental one wrote a different %s file from a run with no cache" % (name, os.path.splitext(cached_filename)[1]))
+		cached_file.close()
+		uncached_file.close()
+directory.cleanup()
+
+if differences:
+	print("%s differences found" % differences)
+	sys.exit(1)
+print("The cached runs after incremental runs wrote the same files as runs with no cache")